@@ -0,0 +1,359 @@
+"""
+Asynchronous variants of the Restless endpoints, for use with ASGI
+deployments. They require Django 4.1 or later (for async handlers in
+class-based views and the async ORM interface).
+"""
+
+import django
+
+if django.VERSION[:2] < (4, 1):
+    raise ImportError('restless.asyncviews requires Django 4.1 or later')
+
+import asyncio
+import functools
+import inspect
+import time
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import View
+
+from .auth import _login_response
+from .http import Http200, Http201, Http500, HttpError
+from .modelviews import (ListEndpoint, DetailEndpoint, ActionEndpoint,
+    _get_form, _load_fieldset)
+from .views import Endpoint
+from . import coalescing, routing, timing
+
+__all__ = ['AsyncEndpoint', 'AsyncListEndpoint', 'AsyncDetailEndpoint',
+    'AsyncActionEndpoint']
+
+
+async def _call(fn, *args, **kwargs):
+    """Call either a coroutine function or a (blocking) regular function."""
+
+    if inspect.iscoroutinefunction(fn):
+        return await fn(*args, **kwargs)
+    return await sync_to_async(fn)(*args, **kwargs)
+
+
+def _async_login_required(fn):
+    @functools.wraps(fn)
+    async def wrapper(self, request, *args, **kwargs):
+        # Loading the session user hits the database
+        response = await sync_to_async(_login_response)(self, request)
+        if response is not None:
+            return response
+        return await fn(self, request, *args, **kwargs)
+    return wrapper
+
+
+async def _cached_response(cache, endpoint, request, build):
+    """Async variant of restless.cache.ResponseCache.get_response."""
+
+    key = await sync_to_async(cache.key)(endpoint, request)
+    response, locked = await sync_to_async(cache.lookup)(key)
+    if response is not None:
+        return response
+
+    deadline = time.time() + cache.lock_timeout
+    while not locked and time.time() < deadline:
+        await asyncio.sleep(cache.poll_interval)
+        response = await sync_to_async(cache.poll)(key)
+        if response is not None:
+            return response
+        locked = await sync_to_async(cache.acquire)(key)
+
+    try:
+        response = await build()
+    except Exception:
+        if locked:
+            await sync_to_async(cache.release)(key)
+        raise
+    await sync_to_async(cache.store)(key, response, locked)
+    return response
+
+
+_flights = {}
+
+
+async def _coalesced_response(key, build):
+    """Async variant of restless.coalescing.run."""
+
+    # Futures can only be awaited in the event loop they were created in
+    loop = asyncio.get_running_loop()
+    key = (loop, key)
+    flight = _flights.get(key)
+    if flight is not None:
+        frozen = await asyncio.shield(flight)
+        if frozen is not None:
+            return coalescing.thaw(frozen)
+        return await build()
+
+    flight = _flights[key] = loop.create_future()
+    frozen = None
+    try:
+        response = await build()
+        frozen = coalescing.share(response)
+        return response
+    finally:
+        del _flights[key]
+        flight.set_result(frozen)
+
+
+def _save_form(endpoint, form, message):
+    if not form.is_valid():
+        raise HttpError(400, message, errors=form.errors)
+    return endpoint.serialize(form.save())
+
+
+class AsyncEndpoint(Endpoint):
+    """
+    Asynchronous variant of :py:class:`restless.views.Endpoint`. The view
+    methods (get(), post(), ...) must be coroutines (`async def`), as
+    required by Django for asynchronous class-based views.
+
+    The request attributes, error handling and wrapping of the returned
+    value into :py:class:`restless.http.JSONResponse` work the same as for
+    the synchronous Endpoint.
+
+    The authenticate(request) method can be either a coroutine or a regular
+    method. A regular method (like the ones provided by the auth mixins) is
+    run in a worker thread, so it can safely use the database.
+    """
+
+    async def _process_authenticate_async(self, request):
+        if hasattr(self, 'authenticate') and callable(self.authenticate):
+            return self._check_auth_response(
+                await _call(self.authenticate, request))
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        if not timing.is_enabled():
+            return await self._dispatch(request, *args, **kwargs)
+
+        with timing.Timings() as timings:
+            response = await self._dispatch(request, *args, **kwargs)
+        timing.report(self, request, response, timings)
+        return response
+
+    async def _handle(self, request, *args, **kwargs):
+        response = View.dispatch(self, request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return self._make_response(response)
+
+    async def _shared_dispatch(self, request, *args, **kwargs):
+        async def build():
+            if self.response_cache is None:
+                return await self._handle(request, *args, **kwargs)
+            return await _cached_response(self.response_cache, self, request,
+                lambda: self._handle(request, *args, **kwargs))
+
+        key = None
+        if self.coalesce_requests:
+            key = await _call(self.get_coalescing_key, request)
+        if key is None:
+            return await build()
+        return await _coalesced_response(key, build)
+
+    async def _dispatch(self, request, *args, **kwargs):
+        self._prepare_request(request)
+
+        route = routing.route(self, request)
+        with route:
+            try:
+                with timing.phase('auth'):
+                    authentication_required = \
+                        await self._process_authenticate_async(request)
+                if authentication_required:
+                    return authentication_required
+
+                with timing.phase('handler'):
+                    if request.method == 'GET' and (self.coalesce_requests or
+                            self.response_cache is not None):
+                        response = await self._shared_dispatch(request,
+                            *args, **kwargs)
+                    else:
+                        response = await self._handle(request, *args,
+                            **kwargs)
+            except HttpError as err:
+                response = err.response
+            except Exception as ex:
+                if settings.DEBUG:
+                    response = Http500(str(ex),
+                        traceback=traceback.format_exc())
+                else:
+                    raise
+
+        return route.pin(self._make_response(response))
+
+
+class AsyncListEndpoint(AsyncEndpoint, ListEndpoint):
+    """
+    Asynchronous variant of :py:class:`restless.modelviews.ListEndpoint`.
+
+    The get_query_set() method can be overridden either with a regular
+    method or with a coroutine. The queryset is serialized in a worker
+    thread, as serialization of related objects may need to run
+    additional queries.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        """Return a serialized list of objects in this endpoint."""
+
+        if 'GET' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        qs = await _call(self.get_query_set, request, *args, **kwargs)
+        qs = self.filter_query_set(request, qs)
+        if not self.version_field:
+            return await sync_to_async(self._get_list)(request, qs)
+
+        version = await _call(self.get_version, request, qs)
+        response, validators = self._check_version(request, version,
+            timestamp=False)
+        if response is None:
+            response = await sync_to_async(self._get_list)(request, qs)
+        return self._add_validators(response, validators)
+
+    async def post(self, request, *args, **kwargs):
+        """Create a new object."""
+
+        if 'POST' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        if isinstance(request.data, list):
+            return Http201(await sync_to_async(self.create_objects)(request,
+                request.data))
+
+        Form = _get_form(self.form, self.model)
+        form = Form(request.data or None, request.FILES)
+        return Http201(await sync_to_async(_save_form)(self, form,
+            'Invalid Data'))
+
+    async def patch(self, request, *args, **kwargs):
+        """Update the objects selected by the query parameters."""
+
+        if 'PATCH' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        qs = await _call(self.get_query_set, request, *args, **kwargs)
+        return await sync_to_async(self.update_objects)(request, qs)
+
+    async def delete(self, request, *args, **kwargs):
+        """Delete the objects selected by the query parameters."""
+
+        if 'DELETE' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        qs = await _call(self.get_query_set, request, *args, **kwargs)
+        return await sync_to_async(self.delete_objects)(request, qs)
+
+
+class AsyncDetailEndpoint(AsyncEndpoint, DetailEndpoint):
+    """
+    Asynchronous variant of :py:class:`restless.modelviews.DetailEndpoint`.
+
+    The default get_instance() is a coroutine looking up the object using
+    the async ORM interface. It can be overridden either with a regular
+    method or with a coroutine.
+    """
+
+    async def get_instance(self, request, *args, **kwargs):
+        """Return a model instance represented by this endpoint.
+
+        See :py:meth:`restless.modelviews.DetailEndpoint.get_instance`.
+        """
+
+        if self.model and self.lookup_field in kwargs:
+            if (self.instance_cache is not None and
+                    request.method in ('GET', 'HEAD')):
+                return await sync_to_async(self._get_cached_instance)(
+                    kwargs[self.lookup_field])
+
+            qs = self.model.objects.all()
+            if request.method == 'GET':
+                qs = _load_fieldset(qs, self.get_fieldset(request))
+            try:
+                return await qs.aget(**{
+                    self.lookup_field: kwargs.get(self.lookup_field)
+                })
+            except self.model.DoesNotExist:
+                raise HttpError(404, 'Resource Not Found')
+        else:
+            raise HttpError(404, 'Resource Not Found')
+
+    async def get(self, request, *args, **kwargs):
+        """Return the serialized object represented by this endpoint."""
+
+        if 'GET' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        response = validators = None
+        if self.version_field:
+            version = await _call(self.get_version, request, *args, **kwargs)
+            response, validators = self._check_version(request, version)
+        if response is None:
+            instance = await _call(self.get_instance, request, *args,
+                **kwargs)
+            response = await sync_to_async(self.serialize)(instance)
+        if validators is None:
+            return response
+        return self._add_validators(response, validators)
+
+    async def put(self, request, *args, **kwargs):
+        """Update the object represented by this endpoint."""
+
+        if 'PUT' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        Form = _get_form(self.form, self.model)
+        instance = await _call(self.get_instance, request, *args, **kwargs)
+        form = Form(request.data or None, request.FILES,
+            instance=instance)
+        return Http200(await sync_to_async(_save_form)(self, form,
+            'Invalid data'))
+
+    async def patch(self, request, *args, **kwargs):
+        """Update some fields of the object represented by this endpoint."""
+
+        if 'PATCH' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        if self.patch_without_lookup:
+            return await sync_to_async(self._patch_without_lookup)(request,
+                kwargs)
+        instance = await _call(self.get_instance, request, *args, **kwargs)
+        return await sync_to_async(self._patch_instance)(request, instance)
+
+    async def delete(self, request, *args, **kwargs):
+        """Delete the object represented by this endpoint."""
+
+        if 'DELETE' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        instance = await _call(self.get_instance, request, *args, **kwargs)
+        await sync_to_async(instance.delete)()
+        return {}
+
+
+class AsyncActionEndpoint(AsyncDetailEndpoint, ActionEndpoint):
+    """
+    Asynchronous variant of :py:class:`restless.modelviews.ActionEndpoint`.
+    The action() method can be either a coroutine or a regular method (in
+    which case it's run in a worker thread).
+    """
+
+    async def post(self, request, *args, **kwargs):
+        if 'POST' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        instance = await _call(self.get_instance, request, *args, **kwargs)
+        return await _call(self.action, request, instance, *args, **kwargs)
+
+    async def action(self, request, obj, *args, **kwargs):
+        raise HttpError(405, 'Method Not Allowed')
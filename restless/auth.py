@@ -1,20 +1,41 @@
 from django.contrib import auth
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
 from django.utils.encoding import DjangoUnicodeDecodeError
 import base64
+import inspect
 
 try:
     from django.utils.encoding import smart_text
 except ImportError:
-    from django.utils.encoding import smart_unicode as smart_text
+    try:
+        from django.utils.encoding import smart_str as smart_text
+    except ImportError:
+        from django.utils.encoding import smart_unicode as smart_text
 
 
+from .cache import LRUCache
 from .views import Endpoint
 from .http import Http200, Http401, Http403
 from .models import serialize
 
 
+# inspect.iscoroutinefunction is not available on Python 2
+iscoroutinefunction = getattr(inspect, 'iscoroutinefunction',
+    lambda fn: False)
+
+
 __all__ = ['UsernamePasswordAuthMixin', 'BasicHttpAuthMixin',
-    'AuthenticateEndpoint', 'login_required']
+    'TokenAuthMixin', 'SignedTokenAuthMixin', 'AuthenticateEndpoint',
+    'login_required', 'create_signed_token']
+
+
+_SESSION_CREDENTIALS_KEY = '_restless_credentials'
+
+
+def _credentials_digest(username, password):
+    return salted_hmac('restless.auth.UsernamePasswordAuthMixin',
+        u'%s:%s' % (username, password)).hexdigest()
 
 
 class UsernamePasswordAuthMixin(object):
@@ -22,8 +43,20 @@ class UsernamePasswordAuthMixin(object):
     :py:class:`restless.views.Endpoint` mixin providing user authentication
     based on username and password (as specified in "username" and "password"
     request GET params).
+
+    On successful authentication, the user is logged in (using the session).
+    If `login_session` is False, the user is authenticated only for the
+    current request instead.
+
+    If the session is already logged in with the same credentials (or no
+    credentials are given), the password isn't checked again and the session
+    is left unchanged. To detect changed credentials, a keyed hash (HMAC) of
+    the credentials is stored in the session on login.
     """
 
+    #: Whether to log the user in using the session
+    login_session = True
+
     def authenticate(self, request):
         if request.method == 'POST':
             self.username = request.data.get('username')
@@ -32,10 +65,42 @@ class UsernamePasswordAuthMixin(object):
             self.username = request.params.get('username')
             self.password = request.params.get('password')
 
+        if self.username is None and self.password is None:
+            return
+
+        if self.login_session:
+            digest = _credentials_digest(self.username, self.password)
+            if self._logged_in_with(request, digest):
+                return
+
         user = auth.authenticate(username=self.username,
             password=self.password)
         if user is not None and user.is_active:
-            auth.login(request, user)
+            if self.login_session:
+                auth.login(request, user)
+                request.session[_SESSION_CREDENTIALS_KEY] = digest
+            else:
+                request.user = user
+
+    @staticmethod
+    def _logged_in_with(request, digest):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_active:
+            return False
+        return constant_time_compare(
+            request.session.get(_SESSION_CREDENTIALS_KEY, ''), digest)
+
+
+#: Process-local cache of verified Basic authentication credentials
+credentials_cache = LRUCache(maxsize=1024)
+
+_CREDENTIALS_SALT = 'restless.auth.BasicHttpAuthMixin'
+
+
+def _user_fingerprint(user):
+    # Changes whenever the password, username or active status is changed
+    return salted_hmac(_CREDENTIALS_SALT + '.user', u'%s:%s:%s' % (
+        user.password, user.get_username(), user.is_active)).hexdigest()
 
 
 # Taken from Django Rest Framework
@@ -43,8 +108,47 @@ class BasicHttpAuthMixin(object):
     """
     :py:class:`restless.views.Endpoint` mixin providing user authentication
     based on HTTP Basic authentication.
+
+    Verifying the password is slow by design, and is done on every request.
+    To avoid that for clients making repeated requests, set
+    `credentials_cache_timeout` to the number of seconds the verified
+    credentials should be remembered for. The cache is keyed by a keyed
+    hash (HMAC) of the Authorization header, and only stores the user id
+    (and a hash of the user's password hash). The cached credentials aren't
+    used after the user's password, username or active status change.
+    With custom authentication backends that don't use the password stored
+    in the User model, password changes are only picked up after the
+    timeout.
     """
 
+    #: Number of seconds to cache verified credentials for (None to disable)
+    credentials_cache_timeout = None
+
+    def _check_credentials(self, header, username, password):
+        timeout = self.credentials_cache_timeout
+        if not timeout:
+            return auth.authenticate(username=username, password=password)
+
+        key = salted_hmac(_CREDENTIALS_SALT, header).hexdigest()
+        cached = credentials_cache.get(key)
+        if cached is not None:
+            pk, fingerprint = cached
+            User = auth.get_user_model()
+            try:
+                user = User._default_manager.get(pk=pk)
+            except User.DoesNotExist:
+                user = None
+            if user is not None and constant_time_compare(
+                    _user_fingerprint(user), fingerprint):
+                return user
+            credentials_cache.delete(key)
+
+        user = auth.authenticate(username=username, password=password)
+        if user is not None and user.is_active:
+            credentials_cache.set(key, (user.pk, _user_fingerprint(user)),
+                timeout)
+        return user
+
     def authenticate(self, request):
         if 'HTTP_AUTHORIZATION' in request.META:
             authdata = request.META['HTTP_AUTHORIZATION'].split()
@@ -60,31 +164,137 @@ class BasicHttpAuthMixin(object):
                 except DjangoUnicodeDecodeError:
                     return
 
-                user = auth.authenticate(username=uname, password=passwd)
+                user = self._check_credentials(
+                    request.META['HTTP_AUTHORIZATION'], uname, passwd)
                 if user is not None and user.is_active:
                     # We don't user auth.login(request, user) because
                     # may be running without session
                     request.user = user
 
 
+class TokenAuthMixin(object):
+    """
+    :py:class:`restless.views.Endpoint` mixin providing user authentication
+    based on API tokens, passed in the Authorization header as
+    "Bearer <key>". Requires "restless.authtoken" in INSTALLED_APPS.
+
+    Tokens are created with `Token.objects.create_token(user)` (see
+    :py:class:`restless.authtoken.models.Token`). If `token_cache_timeout`
+    is set, the token users are cached for that many seconds, so repeated
+    requests with the same token don't need to query the database (see
+    :py:meth:`restless.authtoken.models.TokenManager.get_user`).
+    """
+
+    #: Number of seconds to cache token users for (None to disable)
+    token_cache_timeout = None
+
+    def authenticate(self, request):
+        authdata = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(authdata) == 2 and authdata[0].lower() == 'bearer':
+            from .authtoken.models import Token
+
+            user = Token.objects.get_user(authdata[1],
+                cache_timeout=self.token_cache_timeout)
+            if user is not None and user.is_active:
+                request.user = user
+
+
+_SIGNED_TOKEN_SALT = 'restless.auth.SignedTokenAuthMixin'
+
+
+def create_signed_token(user, salt=_SIGNED_TOKEN_SALT):
+    """
+    Create a signed token for the user, to be checked by
+    :py:class:`SignedTokenAuthMixin`. The token contains the user id and
+    username (readable by the client, but not modifiable) and the time of
+    creation, and is signed using the `SECRET_KEY` setting.
+    """
+
+    return signing.dumps([user.pk, user.get_username()], salt=salt)
+
+
+def _user_stub(pk, username):
+    User = auth.get_user_model()
+    known = {User._meta.pk.attname: pk, User.USERNAME_FIELD: username,
+        'is_active': True}
+    fields = [f.attname for f in User._meta.concrete_fields
+        if f.attname in known]
+    # The other fields are deferred, and loaded only if accessed
+    return User.from_db(None, fields, [known[f] for f in fields])
+
+
+class SignedTokenAuthMixin(object):
+    """
+    :py:class:`restless.views.Endpoint` mixin providing stateless user
+    authentication, based on signed tokens passed in the Authorization
+    header as "Bearer <token>". The tokens are created using
+    :py:func:`create_signed_token` (for example, by
+    :py:class:`AuthenticateEndpoint`), and are valid for
+    `signed_token_max_age` seconds.
+
+    Checking the token doesn't need the database or any other shared
+    storage. The request.user is set to an User instance with only the id
+    and username fields loaded; other fields are loaded from the database
+    when first accessed.
+
+    Since no shared state is involved, the tokens can't be revoked: if the
+    user is deactivated or their password changed, the issued tokens are
+    still valid until they expire. All tokens can be invalidated by changing
+    the `signed_token_salt` (or the `SECRET_KEY` setting).
+    """
+
+    #: Number of seconds the tokens are valid for
+    signed_token_max_age = 3600
+
+    #: Salt (namespace) for the token signatures
+    signed_token_salt = _SIGNED_TOKEN_SALT
+
+    def authenticate(self, request):
+        authdata = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(authdata) == 2 and authdata[0].lower() == 'bearer':
+            try:
+                pk, username = signing.loads(authdata[1],
+                    salt=self.signed_token_salt,
+                    max_age=self.signed_token_max_age)
+            except (signing.BadSignature, TypeError, ValueError):
+                return
+            request.user = _user_stub(pk, username)
+
+
 def login_required(fn):
     """
     Decorator for :py:class:`restless.views.Endpoint` methods to require
     authenticated, active user. If the user isn't authenticated, HTTP 403 is
-    returned immediately (HTTP 401 if Basic HTTP authentication is used).
+    returned immediately (HTTP 401 if Basic HTTP or token authentication is
+    used).
+
+    Can also be used on `async def` methods of
+    :py:class:`restless.asyncviews.AsyncEndpoint`.
     """
+    if iscoroutinefunction(fn):
+        from .asyncviews import _async_login_required
+        return _async_login_required(fn)
+
     def wrapper(self, request, *args, **kwargs):
-        if request.user is None or not request.user.is_active:
-            if isinstance(self, BasicHttpAuthMixin):
-                return Http401()
-            else:
-                return Http403('forbidden')
+        response = _login_response(self, request)
+        if response is not None:
+            return response
         return fn(self, request, *args, **kwargs)
     wrapper.__name__ = fn.__name__
     wrapper.__doc__ = fn.__doc__
     return wrapper
 
 
+def _login_response(endpoint, request):
+    if request.user is None or not request.user.is_active:
+        if isinstance(endpoint, BasicHttpAuthMixin):
+            return Http401()
+        elif isinstance(endpoint, (TokenAuthMixin, SignedTokenAuthMixin)):
+            return Http401('bearer')
+        else:
+            return Http403('forbidden')
+
+
 class AuthenticateEndpoint(Endpoint, UsernamePasswordAuthMixin):
     """
     Session-based authentication API endpoint. Provides a GET method for
@@ -97,10 +307,25 @@ class AuthenticateEndpoint(Endpoint, UsernamePasswordAuthMixin):
 
     On success, the user will get a response with their serialized User
     object, containing id, username, first_name, last_name and email fields.
+
+    If `issue_signed_token` is set, the response also contains a "token"
+    field with a token for :py:class:`SignedTokenAuthMixin`, signed using
+    `signed_token_salt`. In that case, you'll probably also want to set
+    `login_session` to False, so that no session is created.
     """
 
     user_fields = ('id', 'username', 'first_name', 'last_name', 'email')
 
+    #: Whether to issue a signed token to the user
+    issue_signed_token = False
+
+    #: Salt (namespace) for the token signatures
+    signed_token_salt = _SIGNED_TOKEN_SALT
+
     @login_required
     def get(self, request):
-        return Http200(serialize(request.user, fields=self.user_fields))
+        data = serialize(request.user, fields=self.user_fields)
+        if self.issue_signed_token:
+            data['token'] = create_signed_token(request.user,
+                salt=self.signed_token_salt)
+        return Http200(data)
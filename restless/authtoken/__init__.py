@@ -0,0 +1,9 @@
+"""
+Token authentication support. Add "restless.authtoken" to INSTALLED_APPS
+to use :py:class:`restless.auth.TokenAuthMixin`.
+"""
+
+import django
+
+if django.VERSION[:2] < (3, 2):
+    default_app_config = 'restless.authtoken.apps.AuthTokenConfig'
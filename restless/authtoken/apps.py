@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models import signals
+
+
+class AuthTokenConfig(AppConfig):
+    name = 'restless.authtoken'
+    label = 'restless_authtoken'
+    verbose_name = 'Restless auth tokens'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from .models import Token, _invalidate_token, _invalidate_user
+
+        signals.post_save.connect(_invalidate_token, sender=Token)
+        signals.post_delete.connect(_invalidate_token, sender=Token)
+
+        signals.post_save.connect(_invalidate_user, sender=get_user_model())
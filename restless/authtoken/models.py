@@ -0,0 +1,124 @@
+import binascii
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.utils import timezone
+
+from ..cache import LRUCache
+
+__all__ = ['Token', 'hash_key', 'get_token_cache']
+
+#: Process-local cache mapping token hashes to the token users, used unless
+#: the `RESTLESS_TOKEN_CACHE` setting names a Django cache to use instead
+token_cache = LRUCache(maxsize=4096)
+
+_CACHE_PREFIX = 'restless:token:'
+
+
+def get_token_cache():
+    """
+    Return the cache for the token users: the Django cache named in the
+    `RESTLESS_TOKEN_CACHE` setting, or the process-local
+    :py:data:`token_cache` if it's not set.
+    """
+
+    alias = getattr(settings, 'RESTLESS_TOKEN_CACHE', None)
+    if alias is None:
+        return token_cache
+    return caches[alias]
+
+
+def hash_key(key):
+    """Return the hash of the token key, as stored in the database."""
+
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class TokenManager(models.Manager):
+
+    def create_token(self, user, expires=None, name=''):
+        """
+        Create a new token for the user, optionally expiring at the
+        `expires` datetime.
+
+        Returns a (token, key) tuple. Only the hash of the key is stored in
+        the database, so the key can't be retrieved after the token has
+        been created.
+        """
+
+        key = binascii.hexlify(os.urandom(20)).decode('ascii')
+        token = self.create(key_hash=hash_key(key), user=user,
+            expires=expires, name=name)
+        return token, key
+
+    def get_user(self, key, cache_timeout=None):
+        """
+        Return the user the token key belongs to, or None if the token
+        doesn't exist or has expired.
+
+        If `cache_timeout` is set, the user is cached for that many seconds
+        (see :py:func:`get_token_cache`), so repeated lookups of the same
+        token don't need to query the database. The cached entries are
+        removed when the token or the user is changed or deleted. With the
+        process-local cache, that only happens in the process making the
+        change, so the other processes keep accepting a deleted token (or a
+        deactivated user) until their entries expire.
+        """
+
+        key_hash = hash_key(key)
+        cache = get_token_cache()
+        cached = cache.get(_CACHE_PREFIX + key_hash)
+        if cached is None:
+            try:
+                token = self.select_related('user').get(key_hash=key_hash)
+            except self.model.DoesNotExist:
+                return None
+
+            user = token.user
+            fields = user._meta.concrete_fields
+            cached = (type(user), user._state.db,
+                tuple(f.attname for f in fields),
+                tuple(getattr(user, f.attname) for f in fields),
+                token.expires)
+            if cache_timeout:
+                cache.set(_CACHE_PREFIX + key_hash, cached, cache_timeout)
+
+        User, db, field_names, values, expires = cached
+        if expires is not None and expires <= timezone.now():
+            return None
+        # Each request gets its own user instance
+        return User.from_db(db, field_names, values)
+
+
+class Token(models.Model):
+    """
+    API token for :py:class:`restless.auth.TokenAuthMixin`. Only the
+    SHA-256 hash of the token key is stored.
+    """
+
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+        related_name='restless_tokens', on_delete=models.CASCADE)
+    name = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    expires = models.DateTimeField(null=True, blank=True)
+
+    objects = TokenManager()
+
+    def is_expired(self):
+        return self.expires is not None and self.expires <= timezone.now()
+
+
+def _invalidate_token(sender, instance, **kwargs):
+    get_token_cache().delete(_CACHE_PREFIX + instance.key_hash)
+
+
+def _invalidate_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    get_token_cache().delete_many([_CACHE_PREFIX + key_hash
+        for key_hash in Token.objects.filter(user_id=instance.pk)
+        .values_list('key_hash', flat=True)])
@@ -0,0 +1,424 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.exceptions import (FieldDoesNotExist, ImproperlyConfigured,
+    ValidationError)
+from django.db import router, transaction
+from django.db.models import signals
+from django.dispatch import Signal
+from django.utils.encoding import force_bytes
+
+from .coalescing import freeze, thaw
+
+__all__ = ['LRUCache', 'InstanceCache', 'ResponseCache', 'objects_changed']
+
+# Cached in place of the instances that don't exist
+_MISSING = 'restless:missing'
+
+#: Sent (with the model as the sender) when objects are changed without
+#: sending the model signals, eg. by bulk creation or `QuerySet.update()`
+#: in the endpoints. The `pks` argument is the list of the primary keys of
+#: the changed objects and `using` is the database alias. The caches listen
+#: to it to drop the changed objects, and code making such changes itself
+#: can send it too.
+objects_changed = Signal()
+
+
+class LRUCache(object):
+    """
+    Small thread-safe, process-local cache with bounded size. When the
+    cache is full, adding a new entry evicts the least recently used one.
+
+    The methods follow the Django cache API, so the cache can be used
+    in place of a Django cache backend. Entries with `timeout` set to None
+    (the default) never expire.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the value for `key`, marking it as recently used."""
+
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.time():
+                return default
+            self._data[key] = (value, expires)
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Store the value, evicting the oldest entry if needed."""
+
+        expires = None if timeout is None else time.time() + timeout
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys):
+        values = {}
+        for key in keys:
+            value = self.get(key, self)
+            if value is not self:
+                values[key] = value
+        return values
+
+    def set_many(self, data, timeout=None):
+        for key, value in data.items():
+            self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class InstanceCache(object):
+    """
+    Cache of model instances, looked up by the value of `lookup_field`, as
+    used by :py:meth:`restless.modelviews.DetailEndpoint.get_instance`.
+
+    By default, the instances are cached in a process-local LRU cache
+    holding at most `maxsize` instances. To share them between processes,
+    set `backend` to a Django cache alias. Cached instances expire after
+    `timeout` seconds (5 minutes by default; never, if None). Lookups of
+    instances that don't exist are cached too, for `negative_timeout`
+    seconds (set it to 0 to disable this).
+
+    The cached instances are dropped when they're saved or deleted (using
+    the model signals, after the transaction commits as well), or reported
+    as changed by the :py:data:`objects_changed` signal. Other changes
+    (eg. `QuerySet.update()` elsewhere) aren't noticed, and neither are
+    changes made by other processes if the cache is process-local, so set
+    `timeout` accordingly. If `lookup_field` isn't the primary key, saving
+    an instance also reads its old `lookup_field` value, to drop the entry
+    cached under it (for the :py:data:`objects_changed` signal, only the
+    current values are dropped).
+
+    The instances are loaded from the database used for writes, so the
+    cache isn't filled with stale data from a lagging replica. Each lookup
+    returns a new model instance.
+
+    The numbers of cache hits, misses and hits for instances that don't
+    exist are counted, and returned by :py:meth:`stats`.
+    """
+
+    def __init__(self, model, lookup_field='pk', backend=None, maxsize=1024,
+            timeout=300, negative_timeout=5):
+        meta = model._meta
+        try:
+            self.field = meta.pk if lookup_field == 'pk' else \
+                meta.get_field(lookup_field)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured('InstanceCache lookup_field must be '
+                'a field of %s' % meta.object_name)
+
+        self.model = model
+        self.lookup_field = lookup_field
+        self.timeout = timeout
+        self.negative_timeout = negative_timeout
+        if backend is not None:
+            self.cache = caches[backend]
+        else:
+            self.cache = LRUCache(maxsize=maxsize)
+
+        self._prefix = 'restless:instance:%s:%s:%s:' % (meta.app_label,
+            meta.model_name, lookup_field)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'negative_hits': 0}
+
+        if not self.field.primary_key:
+            signals.pre_save.connect(self._pre_save, sender=model)
+        signals.post_save.connect(self._post_change, sender=model)
+        signals.post_delete.connect(self._post_change, sender=model)
+        objects_changed.connect(self._objects_changed, sender=model)
+
+    def _key(self, value):
+        value = self.field.to_python(value)
+        return self._prefix + hashlib.md5(force_bytes(value)).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, value):
+        """Return the instance, or None if there's no such instance."""
+
+        try:
+            key = self._key(value)
+        except ValidationError:
+            return None
+
+        cached = self.cache.get(key)
+        if cached == _MISSING:
+            self._count('negative_hits')
+            return None
+        elif cached is not None:
+            self._count('hits')
+            field_names, values = cached
+            return self.model.from_db(None, field_names, values)
+
+        self._count('misses')
+        manager = self.model._default_manager.db_manager(
+            router.db_for_write(self.model))
+        try:
+            instance = manager.get(**{self.lookup_field: value})
+        except self.model.DoesNotExist:
+            if self.negative_timeout:
+                self.cache.set(key, _MISSING, self.negative_timeout)
+            return None
+
+        fields = instance._meta.concrete_fields
+        self.cache.set(key, (tuple(f.attname for f in fields),
+            tuple(getattr(instance, f.attname) for f in fields)),
+            self.timeout)
+        return instance
+
+    def invalidate(self, value, using=None):
+        """Drop the cached instance with the `lookup_field` value."""
+
+        key = self._key(value)
+        self.cache.delete(key)
+        # Readers might cache the old row again until the change commits
+        transaction.on_commit(lambda: self.cache.delete(key), using=using)
+
+    def _pre_save(self, sender, instance, using=None, **kwargs):
+        if instance.pk is None:
+            return
+        old = sender._default_manager.using(using).filter(
+            pk=instance.pk).values_list(self.field.attname, flat=True)
+        for value in old:
+            if value != getattr(instance, self.field.attname):
+                self.invalidate(value, using)
+
+    def _post_change(self, sender, instance, using=None, **kwargs):
+        self.invalidate(getattr(instance, self.field.attname), using)
+
+    def _objects_changed(self, sender, pks=(), using=None, **kwargs):
+        values = pks
+        if not self.field.primary_key:
+            values = sender._default_manager.using(using).filter(
+                pk__in=pks).values_list(self.field.attname, flat=True)
+        for value in values:
+            self.invalidate(value, using)
+
+    def stats(self):
+        """
+        Return the number of lookups served from the cache (`hits`), from
+        the database (`misses`), and from the cache for instances that
+        don't exist (`negative_hits`), as a dictionary.
+        """
+
+        with self._lock:
+            return dict(self._stats)
+
+
+def _generation_key(model):
+    return 'restless:generation:%s.%s' % (model._meta.app_label,
+        model._meta.model_name)
+
+
+def _bump_generation(cache, model, using=None):
+    # Each change to the model bumps its generation, changing the keys of
+    # all the responses depending on it
+    key = _generation_key(model)
+    cache.set(key, uuid.uuid4().hex, None)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None),
+        using=using)
+
+
+def _connect_generation(backend, model):
+    def bump(sender, using=None, **kwargs):
+        _bump_generation(caches[backend], sender, using)
+
+    uid = 'restless.cache.ResponseCache:%s:%s' % (backend,
+        _generation_key(model))
+    signals.post_save.connect(bump, sender=model, weak=False,
+        dispatch_uid=uid)
+    signals.post_delete.connect(bump, sender=model, weak=False,
+        dispatch_uid=uid)
+    objects_changed.connect(bump, sender=model, weak=False,
+        dispatch_uid=uid)
+
+
+class ResponseCache(object):
+    """
+    Cache of the GET responses of an endpoint, stored in the Django cache
+    `backend`. Set it as the `response_cache` attribute of the endpoint
+    (see :py:class:`restless.views.Endpoint`).
+
+    The responses are cached per request path and query parameters, per
+    user (the authenticated user and the Authorization header) and per the
+    value returned by the `vary_on(request)` function, if set (eg. the
+    authentication scope). Only successful, non-streaming responses are
+    cached.
+
+    As the cached responses are returned without calling the view method,
+    any checks done by it (or its decorators, like `login_required`) are
+    skipped on cache hits. Only set `vary_on_user` to False, sharing the
+    responses between all the clients, for public endpoints.
+
+    The cached responses are fresh for `timeout` seconds (or until
+    invalidated, if it's None). All the responses are dropped when any of
+    the models in `depends_on` is saved or deleted, or reported as changed
+    by the :py:data:`objects_changed` signal (other changes, like
+    `QuerySet.update()` elsewhere, aren't noticed unless
+    :py:meth:`invalidate_model` is called).
+
+    When a response needs to be built, only one worker builds it and the
+    others wait (at most `lock_timeout` seconds) for it to be cached, or
+    for the lock to be released if it can't be cached. When
+    a response expires, it is served for another `stale_timeout` seconds
+    while one worker rebuilds it.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, timeout=60, depends_on=(), vary_on_user=True,
+            vary_on=None, backend='default', stale_timeout=30,
+            lock_timeout=10):
+        self.timeout = timeout
+        self.depends_on = tuple(depends_on)
+        self.vary_on_user = vary_on_user
+        self.vary_on = vary_on
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.cache = caches[backend]
+
+        for model in self.depends_on:
+            _connect_generation(backend, model)
+
+    def _generations(self):
+        keys = [_generation_key(model) for model in self.depends_on]
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                self.cache.add(key, uuid.uuid4().hex, None)
+                generations[key] = self.cache.get(key)
+        return [generations[key] for key in keys]
+
+    def invalidate_model(self, model, using=None):
+        """
+        Drop all the cached responses depending on the model, eg. after
+        changing its objects without sending the model signals.
+        """
+
+        _bump_generation(self.cache, model, using)
+
+    def key(self, endpoint, request):
+        """Return the cache key for the endpoint response to the request."""
+
+        parts = [request.path, sorted(request.GET.lists())]
+        if self.vary_on_user:
+            user = getattr(request, 'user', None)
+            parts.append(user.pk if user is not None and
+                user.is_authenticated else None)
+            parts.append(request.META.get('HTTP_AUTHORIZATION'))
+        if self.vary_on is not None:
+            parts.append(self.vary_on(request))
+        parts.append(self._generations())
+
+        # The key includes the credentials, so use a strong hash
+        digest = hashlib.sha256(force_bytes(repr(parts))).hexdigest()
+        cls = type(endpoint)
+        return 'restless:response:%s.%s:%s' % (cls.__module__,
+            cls.__name__, digest)
+
+    def lookup(self, key):
+        """
+        Return a (response, locked) tuple. The response is the cached one,
+        or None if it needs to be built, in which case `locked` tells if
+        this worker should build it, or wait for another one to do it.
+        """
+
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            return thaw(entry[1]), False
+        if self.acquire(key):
+            return None, True
+        if entry is not None:
+            # Stale, but someone else is already rebuilding it
+            return thaw(entry[1]), False
+        return None, False
+
+    def poll(self, key):
+        """Return the cached response, or None if it isn't cached yet."""
+
+        entry = self.cache.get(key)
+        return thaw(entry[1]) if entry is not None else None
+
+    def store(self, key, response, locked):
+        """Cache the response (if it can be cached) and release the lock."""
+
+        try:
+            frozen = freeze(response)
+            if frozen is not None and response.status_code == 200:
+                if self.timeout is None:
+                    fresh_until, timeout = float('inf'), None
+                else:
+                    fresh_until = time.time() + self.timeout
+                    timeout = self.timeout + self.stale_timeout
+                self.cache.set(key, (fresh_until, frozen), timeout)
+        finally:
+            if locked:
+                self.release(key)
+
+    def acquire(self, key):
+        """Take the lock for building the response, if it's free."""
+
+        return self.cache.add(key + ':lock', 1, self.lock_timeout)
+
+    def release(self, key):
+        self.cache.delete(key + ':lock')
+
+    def get_response(self, endpoint, request, build):
+        """
+        Return the cached response, or the one returned by the `build`
+        function (caching it).
+        """
+
+        key = self.key(endpoint, request)
+        response, locked = self.lookup(key)
+        if response is not None:
+            return response
+
+        # If the lock holder doesn't cache the response (eg. an error), it
+        # releases the lock and the next waiter takes over
+        deadline = time.time() + self.lock_timeout
+        while not locked and time.time() < deadline:
+            time.sleep(self.poll_interval)
+            response = self.poll(key)
+            if response is not None:
+                return response
+            locked = self.acquire(key)
+
+        try:
+            response = build()
+        except Exception:
+            if locked:
+                self.release(key)
+            raise
+        self.store(key, response, locked)
+        return response
@@ -0,0 +1,113 @@
+"""
+Coalescing of identical concurrent requests (single-flight).
+
+Endpoints (see :py:class:`restless.views.Endpoint`) with the
+`coalesce_requests` attribute set to True handle identical GET requests
+arriving at the same time (in the same process) only once: the first
+request is handled normally, and the others wait for it to finish and get
+a copy of its response. The requests are identical if they have the same
+key, as returned by the endpoint's `get_coalescing_key(request)` method
+(by default, :py:func:`request_key`).
+
+Only successful (200 OK) responses are shared. If the first request
+returns a different or a streamed response (or raises an exception), the
+waiting requests are handled separately.
+"""
+
+import threading
+
+from django.http import HttpResponse
+
+__all__ = ['request_key', 'run']
+
+# Headers that are specific to a single response
+_UNSHARED_HEADERS = ('set-cookie', 'server-timing')
+
+
+def freeze(response):
+    """
+    Return a (status, headers, content) tuple from which copies of the
+    response can be made, or None if the response can't be copied.
+    """
+
+    if getattr(response, 'streaming', False):
+        return None
+    headers = [(name, value) for name, value in response.items()
+        if name.lower() not in _UNSHARED_HEADERS]
+    return response.status_code, headers, response.content
+
+
+def share(response):
+    """
+    Return the response frozen with :py:func:`freeze` if it can be shared
+    with the waiting requests, or None.
+    """
+
+    if response.status_code != 200:
+        return None
+    return freeze(response)
+
+
+def thaw(frozen):
+    """Return a copy of a response frozen with :py:func:`freeze`."""
+
+    status, headers, content = frozen
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def request_key(endpoint, request):
+    """
+    Return the key identifying the request: the endpoint, the path, the
+    query parameters, the authenticated user, the authorization header and
+    the conditional request headers.
+    """
+
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    params = tuple((name, tuple(values))
+        for name, values in sorted(request.GET.lists()))
+    return (type(endpoint), request.path, params, user_id,
+        request.META.get('HTTP_AUTHORIZATION'),
+        request.META.get('HTTP_IF_NONE_MATCH'),
+        request.META.get('HTTP_IF_MODIFIED_SINCE'))
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+_flights = {}
+_lock = threading.Lock()
+
+
+def run(key, build):
+    """
+    Return the response returned by the `build` function, or a copy of the
+    response of the concurrent call with the same key, if there is one.
+    """
+
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.response is not None:
+            return thaw(flight.response)
+        return build()
+
+    try:
+        response = build()
+        flight.response = share(response)
+        return response
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
@@ -1,6 +1,11 @@
 from django import http
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.serializers.json import DjangoJSONEncoder
 
+import re
+import uuid
+
 try:
     # json module from python > 2.6
     import json
@@ -8,23 +13,174 @@ except ImportError:
     # use packaged django version of simplejson
     from django.utils import simplejson as json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from . import timing
+
+
+__all__ = ['JSONResponse', 'StreamingJSONResponse', 'JSONErrorResponse',
+    'HttpError', 'Http200', 'Http201', 'Http400', 'Http401', 'Http403',
+    'RawJSON', 'get_json_encoder']
+
+
+class RawJSON(object):
+    """
+    Already encoded JSON data (a bytestring). When encoding data to JSON,
+    the built-in encoders include RawJSON objects in the output as they are,
+    wherever in the data they are. Custom encoder functions (see
+    :py:func:`get_json_encoder`) need to handle RawJSON themselves.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+
+# Placeholders for RawJSON data, replaced with the actual data after
+# encoding the rest of the payload
+_RAW_MARKER = 'restless-raw-%s-' % uuid.uuid4().hex
+_RAW_MARKER_RE = re.compile(b'"' + _RAW_MARKER.encode('ascii') + b'(\\d+)"')
+
+# Encodes everything that isn't supported natively by the JSON encoders
+# exactly the same as DjangoJSONEncoder would
+_django_default = DjangoJSONEncoder().default
+
+
+def _json_default(fragments):
+    def default(o):
+        if isinstance(o, RawJSON):
+            fragments.append(o.data)
+            return '%s%d' % (_RAW_MARKER, len(fragments) - 1)
+        return _django_default(o)
+    return default
+
+
+def _splice(data, fragments):
+    if not fragments:
+        return data
+    return _RAW_MARKER_RE.sub(lambda m: fragments[int(m.group(1))], data)
+
+
+def _json_encoder(data):
+    if isinstance(data, RawJSON):
+        return data.data
+    fragments = []
+    return _splice(json.dumps(data,
+        default=_json_default(fragments)).encode('utf-8'), fragments)
+
+
+def _orjson_encoder(data):
+    if isinstance(data, RawJSON):
+        return data.data
+    fragments = []
+    try:
+        return _splice(orjson.dumps(data, default=_json_default(fragments),
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS),
+            fragments)
+    except TypeError:
+        # Something orjson can't handle, like integers over 64 bits
+        return _json_encoder(data)
 
-__all__ = ['JSONResponse', 'JSONErrorResponse', 'HttpError',
-    'Http200', 'Http201', 'Http400', 'Http401', 'Http403']
+
+JSON_ENCODERS = {
+    'json': _json_encoder,
+    'orjson': _orjson_encoder if orjson is not None else _json_encoder,
+}
+
+_imported_encoders = {}
+
+
+def get_json_encoder(name=None):
+    """
+    Return the JSON encoder function with the given name. The function takes
+    the data to encode and returns a JSON-encoded bytestring.
+
+    The name can be either one of the built-in encoders ("json" for the
+    standard library encoder, "orjson" for orjson), or a dotted path to a
+    custom encoder function. If the name is not specified, the
+    `RESTLESS_JSON_ENCODER` setting is used, defaulting to "json".
+
+    If orjson isn't installed, the standard library encoder is used instead.
+    The built-in encoders produce the same data for all types supported by
+    `django.core.serializers.json.DjangoJSONEncoder` (eg. Decimal, datetime,
+    UUID and lazy strings), though the whitespace and escaping of non-ASCII
+    characters in the output may differ.
+    """
+
+    if name is None:
+        name = getattr(settings, 'RESTLESS_JSON_ENCODER', 'json')
+
+    encoder = JSON_ENCODERS.get(name) or _imported_encoders.get(name)
+    if encoder is None:
+        if '.' not in name:
+            raise ImproperlyConfigured('Unknown JSON encoder: %s' % name)
+
+        from django.utils.module_loading import import_string
+        encoder = _imported_encoders[name] = import_string(name)
+    return encoder
 
 
 class JSONResponse(http.HttpResponse):
     """HTTP response with JSON body ("application/json" content type)"""
 
+    #: Name of the JSON encoder to use; see :py:func:`get_json_encoder`
+    json_encoder = None
+
     def __init__(self, data, **kwargs):
         """
         Create a new JSONResponse with the provided data (will be serialized
-        to JSON using django.core.serializers.json.DjangoJSONEncoder).
+        to JSON using the encoder specified by `json_encoder`, by default
+        django.core.serializers.json.DjangoJSONEncoder).
         """
 
         kwargs['content_type'] = 'application/json; charset=utf-8'
-        super(JSONResponse, self).__init__(json.dumps(data,
-            cls=DjangoJSONEncoder), **kwargs)
+        encoder = get_json_encoder(self.json_encoder)
+        with timing.phase('encode'):
+            content = encoder(data)
+        super(JSONResponse, self).__init__(content, **kwargs)
+
+
+class StreamingJSONResponse(http.StreamingHttpResponse):
+    """
+    Streaming HTTP response with JSON array body ("application/json" content
+    type), written out incrementally as the items are produced.
+    """
+
+    #: Name of the JSON encoder to use; see :py:func:`get_json_encoder`
+    json_encoder = None
+    buffer_size = 64 * 1024
+
+    def __init__(self, items, **kwargs):
+        """
+        Create a new StreamingJSONResponse from the provided iterable (for
+        example, a generator returned by
+        :py:func:`restless.models.iter_serialize`). Each item is encoded
+        to JSON as it is consumed; encoded items are sent to the client
+        in chunks of approximately `buffer_size` bytes.
+        """
+
+        kwargs['content_type'] = 'application/json; charset=utf-8'
+        super(StreamingJSONResponse, self).__init__(
+            self._encode(items), **kwargs)
+
+    def _encode(self, items):
+        encoder = get_json_encoder(self.json_encoder)
+        buf = [b'[']
+        size = 1
+        sep = b''
+        for item in items:
+            chunk = sep + encoder(item)
+            buf.append(chunk)
+            size += len(chunk)
+            sep = b', '
+            if size >= self.buffer_size:
+                yield b''.join(buf)
+                buf = []
+                size = 0
+        buf.append(b']')
+        yield b''.join(buf)
 
 
 class JSONErrorResponse(JSONResponse):
@@ -64,6 +220,8 @@ class Http401(http.HttpResponse):
         super(Http401, self).__init__()
         if typ == 'basic':
             self['WWW-Authenticate'] = 'Basic realm="%s"' % realm
+        elif typ == 'bearer':
+            self['WWW-Authenticate'] = 'Bearer realm="%s"' % realm
         else:
             assert False, 'Invalid type ' + str(typ)
             self.status_code = 403
@@ -1,11 +1,37 @@
+import hashlib
+import operator
 import six
 
+from django import VERSION as DJANGO_VERSION
 from django.core import serializers
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
+from django.db.models import signals
 
-from django.utils.encoding import force_text
+from django.utils.encoding import force_bytes
 
-__all__ = ['serialize', 'flatten']
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django 4.0+
+    from django.utils.encoding import force_str as force_text
+
+from . import timing
+from .cache import LRUCache, objects_changed
+from .http import RawJSON, get_json_encoder
+
+try:
+    from django.db.models import Prefetch
+    from django.db.models.query import ModelIterable
+except ImportError:  # Django < 1.9
+    Prefetch = ModelIterable = None
+
+try:
+    from django.db.models import prefetch_related_objects
+except ImportError:  # Django < 1.10
+    prefetch_related_objects = None
+
+__all__ = ['serialize', 'iter_serialize', 'flatten', 'FragmentCache']
 
 
 def serialize_deprecated(src, fields=None, related=None):
@@ -74,44 +100,464 @@ def serialize_deprecated(src, fields=None, related=None):
         return src
 
 
-def serialize_model(obj, fields=None, include=None, exclude=None,
-        fixup=None):
+class _Plan(object):
+    """
+    Serialization plan for a single model class: the list of attribute
+    descriptions resolved against the model fields, ready to be run over
+    any number of instances of that model.
+    """
+
+    def __init__(self, model, spec):
+        fieldmap = {}
+        for f in model._meta.concrete_model._meta.local_fields:
+            fieldmap[f.name] = f
+
+        if spec.fields is None:
+            fields = list(fieldmap.keys())
+        else:
+            fields = list(spec.fields)
+
+        if spec.exclude is not None:
+            fields = [f for f in fields if f not in spec.exclude]
+
+        if spec.include is not None:
+            for i in spec.include:
+                if isinstance(i, tuple) or (isinstance(i, six.string_types)):
+                    fields.append(i)
+
+        self.steps = []
+        self.related = []
+
+        # Model fields being serialized, as (key, name, attname) tuples. If
+        # nothing else (accessor functions, properties, fixups) needs the
+        # model instance, the plan is projectable: only these columns need
+        # to be loaded from the database.
+        self.columns = []
+        self.projectable = spec.fixup is None
+        value_converters = []
+
+        for f in fields:
+            if isinstance(f, six.string_types):
+                field = fieldmap.get(f)
+                if field is None:
+                    self.projectable = False
+                    self.steps.append((f, _attribute_getter(f, _to_text)))
+                    continue
+
+                converters = _field_converters(field)
+                if converters is None:
+                    converters = (_to_text, _UNSUPPORTED)
+                self.columns.append((f, f, field.attname))
+                value_converters.append(converters[1])
+                self.steps.append((f, _attribute_getter(field.attname,
+                    converters[0])))
+            elif isinstance(f, tuple):
+                k, v = f
+                if callable(v):
+                    self.steps.append((k, v))
+                    self.projectable = False
+                elif isinstance(v, dict) and 'related' in v:
+                    self.steps.append((k, _deprecated_getter(k, v)))
+                    self.projectable = False
+                elif isinstance(v, dict):
+                    sub = _Spec(**v)
+                    self.steps.append((k, _related_getter(k, sub)))
+                    self.related.append((k, sub))
+
+        self.fixup = spec.fixup
+        self.values_only = (self.projectable and not self.related and
+            _UNSUPPORTED not in value_converters)
+
+        self._keys = [key for key, name, attname in self.columns]
+        if any(value_converters):
+            self._value_converters = [c or _identity
+                for c in value_converters]
+        else:
+            self._value_converters = None
+
+    def __call__(self, obj):
+        data = {}
+        for key, getter in self.steps:
+            data[key] = getter(obj)
+
+        if self.fixup:
+            data = self.fixup(obj, data)
+
+        return data
+
+    def values_list(self, qs):
+        """Limit the QuerySet to the rows of serialized column values."""
+
+        return qs.values_list(*[attname for key, name, attname in
+            self.columns])
+
+    def from_values(self, row):
+        """Serialize a row returned by :py:meth:`values_list`."""
+
+        if self._value_converters is None:
+            return dict(zip(self._keys, row))
+        return dict(zip(self._keys, [conv(v) for conv, v in
+            zip(self._value_converters, row)]))
+
+
+def _identity(value):
+    return value
+
+
+def _to_text(value):
+    return force_text(value, strings_only=True)
+
+
+def _uuid_to_text(value):
+    return None if value is None else six.text_type(value)
+
+
+def _file_to_text(value):
+    return value.name or ''
+
+
+def _file_name_to_text(value):
+    return value or ''
+
+
+# Marks columns that can't be serialized from values_list rows
+_UNSUPPORTED = object()
+
+
+# Fields whose values (as stored on the instance and as read from the
+# database) are already primitive types or strings, which force_text
+# would return unchanged. Subclasses aren't included, as they can
+# convert the values to something else.
+_PLAIN_FIELDS = frozenset(getattr(models, name) for name in (
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+    'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+    'PositiveSmallIntegerField', 'PositiveBigIntegerField', 'BooleanField',
+    'NullBooleanField', 'FloatField', 'DecimalField', 'DateField',
+    'DateTimeField', 'TimeField', 'CharField', 'TextField', 'EmailField',
+    'SlugField', 'URLField',
+) if hasattr(models, name))
+
+
+def _field_converters(field):
+    """
+    Return functions converting a field value read from the model instance
+    and from a `values_list` row, respectively, to the same value as
+    `force_text(value, strings_only=True)` would. None means the value can
+    be used as is. Returns None if the field type isn't known.
+    """
+
+    if isinstance(field, models.ForeignKey):
+        target = getattr(field, 'target_field', None)
+        if target is None:
+            return None
+        converters = _field_converters(target)
+        if converters is None:
+            return None
+        # The instance attribute holds the raw key value
+        return (converters[1], converters[1])
+
+    cls = type(field)
+    if cls in _PLAIN_FIELDS:
+        return (None, None)
+    elif cls is getattr(models, 'UUIDField', None):
+        return (_uuid_to_text, _uuid_to_text)
+    elif cls is models.FileField or cls is models.ImageField:
+        return (_file_to_text, _file_name_to_text)
+    else:
+        return None
+
+
+def _attribute_getter(attname, convert=None):
+    if convert is None:
+        return operator.attrgetter(attname)
+
+    def getter(obj):
+        return convert(getattr(obj, attname))
+    return getter
+
 
-    fieldmap = {}
-    for f in obj._meta.concrete_model._meta.local_fields:
-        fieldmap[f.name] = f.attname
+def _related_getter(attname, spec):
+    def getter(obj):
+        return spec.serialize(getattr(obj, attname))
+    return getter
 
-    def getfield(f):
-        return getattr(obj, fieldmap.get(f, f))
 
-    if fields is None:
-        fields = list(fieldmap.keys())
+def _deprecated_getter(attname, options):
+    def getter(obj):
+        return serialize(getattr(obj, attname), **options)
+    return getter
+
+
+def _relations(model):
+    """Map attribute names of model relations to their fields."""
+
+    relations = {}
+    for f in model._meta.get_fields():
+        if not f.is_relation or f.related_model is None:
+            continue
+        if f.auto_created and not f.concrete:
+            relations[f.get_accessor_name()] = f
+        else:
+            relations[f.name] = f
+    return relations
+
+
+def _related_lookups(model, spec, prefix=''):
+    """
+    Collect select_related and prefetch_related lookups needed to fetch
+    related objects described by nested attribute descriptions in `spec`.
+
+    Also returns the names of the forward relation fields that need to be
+    loaded for the lookups to work, or None if the relations can't be
+    fetched from a QuerySet limited to just the serialized fields.
+    """
+
+    select, prefetch, load = [], [], []
+    related = spec.plan_for(model).related
+    if not related:
+        return select, prefetch, load
+
+    relations = _relations(model)
+    for name, sub in related:
+        field = relations.get(name)
+        if field is None:
+            load = None
+            continue
+
+        path = prefix + name
+        if field.many_to_one or field.one_to_one:
+            select.append(path)
+            sub_select, sub_prefetch, _ = _related_lookups(
+                field.related_model, sub, path + '__')
+            select.extend(sub_select)
+            prefetch.extend(sub_prefetch)
+            if field.concrete and load is not None:
+                load.append(field.name)
+            else:
+                load = None
+        else:
+            if field.many_to_many:
+                required = ()
+            elif field.auto_created:
+                # reverse foreign key; the key is needed to match the
+                # prefetched objects to the ones being serialized
+                required = (field.field.name,)
+            else:
+                required = None
+            queryset = _optimize_query_set(
+                field.related_model._default_manager.all(), sub,
+                required=required)
+            prefetch.append(Prefetch(path, queryset=queryset))
+
+    return select, prefetch, load
+
+
+def _projectable(qs):
+    """Check if the QuerySet can be limited to a subset of its columns."""
+
+    query = qs.query
+    return not (query.distinct or query.annotations or query.extra or
+        query.deferred_loading[0] or getattr(query, 'combinator', None))
+
+
+def _optimize_query_set(qs, spec, required=()):
+    """
+    Add select_related and prefetch_related to a QuerySet that's about to
+    be serialized, so the related objects are fetched in a constant number
+    of queries instead of one (or more) query per object.
+
+    If the serialization only needs model fields, the QuerySet is also
+    limited (using `only`) to the serialized fields, the primary key and
+    the fields in `required`. Passing None as `required` disables this.
+    """
+
+    if (ModelIterable is None or qs._result_cache is not None or
+            not issubclass(qs._iterable_class, ModelIterable)):
+        return qs
+
+    plan = spec.plan_for(qs.model)
+    select, prefetch, load = _related_lookups(qs.model, spec)
+
+    # Don't traverse relations the QuerySet defers, and leave alone
+    # anything that's already explicitly being prefetched.
+    if qs.query.select_related is True or qs.query.deferred_loading[0]:
+        select = []
+
+    seen = [getattr(lookup, 'prefetch_to', lookup)
+        for lookup in qs._prefetch_related_lookups]
+    prefetch = [p for p in prefetch if not any(s == p.prefetch_to or
+        s.startswith(p.prefetch_to + '__') for s in seen)]
+
+    if (plan.projectable and load is not None and required is not None and
+            _projectable(qs)):
+        names = set(name for key, name, attname in plan.columns)
+        names.update(load)
+        names.update(required)
+        names.add(qs.model._meta.pk.name)
+        if names != set(f.name for f in qs.model._meta.concrete_fields):
+            qs = qs.only(*names)
+
+    if select:
+        qs = qs.select_related(*select)
+    if prefetch:
+        qs = qs.prefetch_related(*prefetch)
+    return qs
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
     else:
-        fields = list(fields)
+        return value
+
+
+_plan_cache = LRUCache(maxsize=256)
 
-    if exclude is not None:
-        fields = [f for f in fields if f not in exclude]
 
-    if include is not None:
-        for i in include:
-            if isinstance(i, tuple) or (isinstance(i, six.string_types)):
-                fields.append(i)
+class _Spec(object):
+    """
+    Serialization options (as passed to :py:func:`serialize`) shared by all
+    the objects serialized in one go. Compiled plans are looked up once per
+    model class and reused for every object of that class.
+    """
+
+    def __init__(self, fields=None, include=None, exclude=None, fixup=None):
+        self.fields = fields
+        self.include = include
+        self.exclude = exclude
+        self.fixup = fixup
+        self._plans = {}
+
+        try:
+            self.key = (_freeze(fields), _freeze(include), _freeze(exclude),
+                fixup)
+            hash(self.key)
+        except TypeError:
+            # Something in the spec is unhashable, so we can't cache it
+            self.key = None
+
+    def plan_for(self, model):
+        plan = self._plans.get(model)
+        if plan is None:
+            if self.key is None:
+                plan = _Plan(model, self)
+            else:
+                cache_key = (model, self.key)
+                plan = _plan_cache.get(cache_key)
+                if plan is None:
+                    plan = _Plan(model, self)
+                    _plan_cache.set(cache_key, plan)
+            self._plans[model] = plan
+        return plan
+
+    def values_plan_for(self, qs):
+        """
+        Return the plan for serializing the QuerySet from the rows of column
+        values instead of model instances, or None if that's not possible.
+        """
+
+        if (ModelIterable is None or qs._result_cache is not None or
+                qs._iterable_class is not ModelIterable or
+                qs._prefetch_related_lookups or not _projectable(qs)):
+            return None
+
+        plan = self.plan_for(qs.model)
+        return plan if plan.values_only else None
+
+    def iterate(self, src, chunk_size):
+        if isinstance(src, models.Manager):
+            src = src.all()
+
+        if not isinstance(src, models.query.QuerySet):
+            for item in src:
+                yield self.serialize(item)
+            return
+
+        plan = self.values_plan_for(src)
+        if plan is not None:
+            for row in _iterator(plan.values_list(src), chunk_size):
+                yield plan.from_values(row)
+            return
+
+        qs = _optimize_query_set(src, self)
+        lookups = qs._prefetch_related_lookups
+        if qs._result_cache is not None or (lookups and
+                prefetch_related_objects is None):
+            for item in qs:
+                yield self.serialize(item)
+            return
+
+        # QuerySet.iterator() ignores prefetch_related, so prefetch the
+        # related objects ourselves, one chunk at a time.
+        chunk = []
+        for item in _iterator(qs.prefetch_related(None), chunk_size):
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                for obj in self._prefetch(chunk, lookups):
+                    yield self.serialize(obj)
+                chunk = []
+        for obj in self._prefetch(chunk, lookups):
+            yield self.serialize(obj)
+
+    @staticmethod
+    def _prefetch(objs, lookups):
+        if objs and lookups:
+            prefetch_related_objects(objs, *lookups)
+        return objs
+
+    def _prefetch_list(self, objs):
+        # Lists of instances of the same model get the related objects
+        # prefetched, like QuerySets do.
+        objs = list(objs)
+        if (not objs or prefetch_related_objects is None or
+                not isinstance(objs[0], models.Model)):
+            return objs
+
+        model = type(objs[0])
+        if any(type(obj) is not model for obj in objs):
+            return objs
+        select, prefetch, _ = _related_lookups(model, self)
+        return self._prefetch(objs, select + prefetch)
+
+    def serialize(self, src):
+        if isinstance(src, models.Model):
+            return self.plan_for(src.__class__)(src)
+
+        elif isinstance(src, models.Manager):
+            return self.serialize(src.all())
+
+        elif isinstance(src, models.query.QuerySet):
+            plan = self.values_plan_for(src)
+            if plan is not None:
+                return [plan.from_values(row)
+                    for row in plan.values_list(src)]
+            return [self.serialize(i) for i in _optimize_query_set(src, self)]
+
+        elif isinstance(src, list) or isinstance(src, set):
+            return [self.serialize(i) for i in self._prefetch_list(src)]
+
+        elif isinstance(src, dict):
+            return dict((k, self.serialize(v)) for k, v in src.items())
+
+        else:
+            return src
+
+
+def _iterator(qs, chunk_size):
+    if DJANGO_VERSION >= (2, 0):
+        return qs.iterator(chunk_size=chunk_size)
+    return qs.iterator()
 
-    data = {}
-    for f in fields:
-        if isinstance(f, six.string_types):
-            data[f] = force_text(getfield(f), strings_only=True)
-        elif isinstance(f, tuple):
-            k, v = f
-            if callable(v):
-                data[k] = v(obj)
-            elif isinstance(v, dict):
-                data[k] = serialize(getattr(obj, k), **v)
 
-    if fixup:
-        data = fixup(obj, data)
+def serialize_model(obj, fields=None, include=None, exclude=None,
+        fixup=None):
+    """Serialize a single model instance, without using the plan cache."""
 
-    return data
+    spec = _Spec(fields=fields, include=include, exclude=exclude,
+        fixup=fixup)
+    return _Plan(obj.__class__, spec)(obj)
 
 
 def serialize(src, fields=None, related=None, include=None, exclude=None,
@@ -158,6 +604,25 @@ def serialize(src, fields=None, related=None, include=None, exclude=None,
     objects to be serialized) is deprecated and included only for backwards
     compatibility.
 
+    The attribute descriptions are resolved against the model fields once
+    per model class, and the resulting serialization plan is reused for all
+    the objects of that class. Plans are also kept in a bounded LRU cache
+    between calls, so repeated serialization with the same options (and the
+    same fixup and accessor functions) doesn't need to resolve them again.
+
+    When serializing a QuerySet that hasn't been evaluated yet, the related
+    objects described by nested attribute descriptions are fetched along
+    with it, using `select_related` for forward foreign keys and one-to-one
+    relations, and `prefetch_related` for reverse and many-to-many relations.
+    This keeps the number of database queries constant, regardless of the
+    number of objects serialized. Lookups already specified on the QuerySet
+    are left alone.
+
+    If only model fields are serialized (no accessor functions, properties or
+    fixup), the QuerySet is also limited to the needed columns using `only`.
+    If additionally no related objects are serialized, the data is read using
+    `values_list`, without creating model instances at all.
+
     Example::
 
         serialize(obj, fields=[
@@ -185,27 +650,192 @@ def serialize(src, fields=None, related=None, include=None, exclude=None,
         warnings.warn("'related' is deprecated syntax", DeprecationWarning)
         return serialize_deprecated(src, fields=fields, related=related)
 
-    def subs(subsrc):
-        return serialize(subsrc, fields=fields, include=include,
-            exclude=exclude, fixup=fixup)
+    spec = _Spec(fields=fields, include=include, exclude=exclude,
+        fixup=fixup)
+    with timing.phase('serialize'):
+        return spec.serialize(src)
 
-    if isinstance(src, models.Manager):
-        return [subs(i) for i in src.all()]
 
-    elif (isinstance(src, list) or
-            isinstance(src, models.query.QuerySet) or
-            isinstance(src, set)):
-        return [subs(i) for i in src]
+def iter_serialize(src, fields=None, include=None, exclude=None, fixup=None,
+        chunk_size=2000):
+    """Serialize a QuerySet (or any other iterable) item by item.
 
-    elif isinstance(src, dict):
-        return dict((k, subs(v)) for k, v in src.items())
+    Works like :py:func:`serialize`, but returns a generator yielding the
+    serialized items one by one, instead of a list holding all of them.
+    QuerySets are read from the database using `iterator()` in chunks of
+    `chunk_size` rows (related objects are prefetched for each chunk), so
+    the memory use doesn't depend on the number of items.
 
-    elif isinstance(src, models.Model):
-        return serialize_model(src, fields=fields, include=include,
-            exclude=exclude, fixup=fixup)
+    Returning the generator from an :py:class:`restless.views.Endpoint`
+    view method streams the items to the client as a JSON array (see
+    :py:class:`restless.http.StreamingJSONResponse`).
+    """
 
-    else:
-        return src
+    spec = _Spec(fields=fields, include=include, exclude=exclude,
+        fixup=fixup)
+    return spec.iterate(src, chunk_size)
+
+
+class FragmentCache(object):
+    """Cache of serialized and JSON-encoded model instances.
+
+    The instances of `model` are serialized as with :py:func:`serialize`,
+    using the `fields`, `include`, `exclude` and `fixup` options, encoded to
+    JSON and the encoded data is cached. The :py:meth:`serialize` method
+    returns a :py:class:`restless.http.RawJSON` object with the data, which
+    is included in JSON responses without encoding it again.
+
+    By default, the data is cached in a process-local LRU cache holding at
+    most `maxsize` instances. To use a Django cache instead, set `backend`
+    to the cache alias. In that case, `name` must also be set, uniquely
+    identifying the serialization options (change it when you change the
+    options).
+
+    The cached data is dropped when the instance is saved or deleted (using
+    the post_save and post_delete signals, or the
+    :py:data:`restless.cache.objects_changed` signal). If `version_field` is
+    set (for example to an `updated_at` or version counter field), its value
+    is also made part of the cache key, so instances changed by code that
+    doesn't send the signals (eg. `QuerySet.update()`), or in another
+    process using its own local cache, aren't served stale as long as the
+    field is updated as well. Cached data expires after `timeout` seconds
+    (never, if None).
+
+    Example::
+
+        book_fragments = FragmentCache(Book, fields=['id', 'title'],
+            version_field='updated_at')
+
+        class BookList(ListEndpoint):
+            model = Book
+
+            def serialize(self, objs):
+                return book_fragments.serialize(objs)
+    """
+
+    def __init__(self, model, fields=None, include=None, exclude=None,
+            fixup=None, name=None, version_field=None, backend=None,
+            maxsize=1024, timeout=None, encoder=None):
+        self.model = model
+        self.version_field = version_field
+        self.timeout = timeout
+        self.encoder = encoder
+        self._spec = _Spec(fields=fields, include=include, exclude=exclude,
+            fixup=fixup)
+
+        if backend is not None:
+            if name is None:
+                raise ImproperlyConfigured('FragmentCache using a Django '
+                    'cache backend must have a name')
+            self.cache = caches[backend]
+        else:
+            self.cache = LRUCache(maxsize=maxsize)
+
+        self._prefix = 'restless:fragment:%s:%s:%s:' % (
+            model._meta.app_label, model._meta.model_name, name or '')
+
+        signals.post_save.connect(self._invalidate, sender=model)
+        signals.post_delete.connect(self._invalidate, sender=model)
+        objects_changed.connect(self._objects_changed, sender=model)
+
+    def _key(self, pk, version=None):
+        if self.version_field is None:
+            return '%s%s' % (self._prefix, pk)
+        version = hashlib.md5(force_bytes(version)).hexdigest()
+        return '%s%s:%s' % (self._prefix, pk, version)
+
+    def _key_for(self, obj):
+        if self.version_field is None:
+            return self._key(obj.pk)
+        return self._key(obj.pk, getattr(obj, self.version_field))
+
+    def _invalidate(self, sender, instance, **kwargs):
+        self.cache.delete(self._key_for(instance))
+
+    def _objects_changed(self, sender, pks=(), **kwargs):
+        # Versioned keys change along with the version
+        if self.version_field is None:
+            self.cache.delete_many([self._key(pk) for pk in pks])
+
+    def _encode(self, objs):
+        """Encode and cache the objects, return {pk: (key, data)} dict."""
+
+        encoder = get_json_encoder(self.encoder)
+        encoded = dict((obj.pk, (self._key_for(obj),
+            encoder(self._spec.serialize(obj)))) for obj in objs)
+        self.cache.set_many(dict(encoded.values()), self.timeout)
+        return encoded
+
+    def encode(self, obj):
+        """Return the encoded data for the model instance."""
+
+        data = self.cache.get(self._key_for(obj))
+        if data is None:
+            data = self._encode([obj])[obj.pk][1]
+        return data
+
+    def encode_many(self, src):
+        """
+        Return a list of encoded data for the instances in the QuerySet (or
+        any other iterable). For QuerySets that haven't been evaluated yet,
+        only the primary keys (and versions) are read at first, and only the
+        instances that aren't cached are loaded from the database (using
+        the same QuerySet, so annotations and other customizations are kept).
+        """
+
+        if isinstance(src, models.Manager):
+            src = src.all()
+
+        # Combined queries (union, ...) can't be filtered, so they're loaded
+        lazy = (isinstance(src, models.query.QuerySet) and
+            src._result_cache is None and
+            not getattr(src.query, 'combinator', None))
+        if not lazy:
+            objs = list(src)
+            keys = [self._key_for(obj) for obj in objs]
+            fragments = self.cache.get_many(keys)
+            missing = [obj for obj, key in zip(objs, keys)
+                if key not in fragments]
+            encoded = self._encode(missing) if missing else {}
+            return [fragments[key] if key in fragments else
+                encoded[obj.pk][1] for obj, key in zip(objs, keys)]
+
+        if self.version_field is None:
+            rows = [(pk,) for pk in src.values_list('pk', flat=True)]
+        else:
+            rows = list(src.values_list('pk', self.version_field))
+        keys = [self._key(*row) for row in rows]
+        fragments = self.cache.get_many(keys)
+
+        missing = [row[0] for row, key in zip(rows, keys)
+            if key not in fragments]
+        encoded = {}
+        if missing:
+            qs = src.all()
+            qs.query.clear_limits()
+            qs = qs.order_by().filter(pk__in=missing)
+            encoded = self._encode(_optimize_query_set(qs, self._spec))
+
+        result = []
+        for row, key in zip(rows, keys):
+            data = fragments.get(key)
+            if data is None:
+                # Might've been deleted since the keys were read
+                data = encoded.get(row[0], (None, None))[1]
+            if data is not None:
+                result.append(data)
+        return result
+
+    def serialize(self, src):
+        """
+        Return a :py:class:`restless.http.RawJSON` object holding either a
+        single encoded model instance, or a JSON array of them (if `src` is
+        a QuerySet, a Manager or any other iterable).
+        """
+
+        if isinstance(src, models.Model):
+            return RawJSON(self.encode(src))
+        return RawJSON(b'[' + b', '.join(self.encode_many(src)) + b']')
 
 
 def flatten(attname):
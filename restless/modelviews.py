@@ -1,11 +1,24 @@
+import calendar
+import datetime
+import hashlib
+
+from django.core.exceptions import (ImproperlyConfigured, ValidationError,
+    FieldDoesNotExist)
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, Max
 from django.forms.models import modelform_factory
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
+from .cache import objects_changed
 from .views import Endpoint
 from .http import HttpError, Http200, Http201
 
-from .models import serialize
+from .models import serialize, _Spec, _optimize_query_set
+from .pagination import cursor_page, offset_page
 
-__all__ = ['ListEndpoint', 'DetailEndpoint', 'ActionEndpoint']
+__all__ = ['ListEndpoint', 'DetailEndpoint', 'ActionEndpoint',
+    'FILTER_LOOKUPS']
 
 
 def _get_form(form, model):
@@ -24,7 +37,272 @@ def _get_form(form, model):
         raise NotImplementedError('Form or Model class not specified')
 
 
-class ListEndpoint(Endpoint):
+def _int_param(request, name, default):
+    try:
+        return int(request.params.get(name, default))
+    except (TypeError, ValueError):
+        raise HttpError(400, 'Invalid %s' % name)
+
+
+#: Lookups that can be allowed in `ListEndpoint.filter_fields`
+FILTER_LOOKUPS = ('exact', 'in', 'range', 'gt', 'gte', 'lt', 'lte', 'isnull')
+
+_filter_specs = {}
+
+
+def _is_indexed(field):
+    if field.primary_key or field.unique or field.db_index:
+        return True
+
+    # Fields leading a multi-column index can use it on their own
+    meta = field.model._meta
+    groups = list(getattr(meta, 'index_together', ()))
+    groups.extend(meta.unique_together)
+    groups.extend(index.fields for index in getattr(meta, 'indexes', ()))
+    groups.extend(getattr(constraint, 'fields', ())
+        for constraint in getattr(meta, 'constraints', ()))
+    return any(group and group[0].lstrip('-') == field.name
+        for group in groups)
+
+
+def _get_field(endpoint, name):
+    meta = endpoint.model._meta
+    try:
+        field = meta.pk if name == 'pk' else meta.get_field(name)
+    except FieldDoesNotExist:
+        raise ImproperlyConfigured('Unknown field %s.%s' %
+            (meta.object_name, name))
+    if endpoint.require_indexed_filters and not _is_indexed(field):
+        raise ImproperlyConfigured('Field %s.%s is not indexed; add an '
+            'index or set require_indexed_filters to False' %
+            (meta.object_name, name))
+    return field
+
+
+def _get_filter_specs(endpoint):
+    # The fields are resolved (and checked) once per endpoint class
+    cls = type(endpoint)
+    specs = _filter_specs.get(cls)
+    if specs is not None:
+        return specs
+
+    filter_fields = endpoint.filter_fields or {}
+    if not isinstance(filter_fields, dict):
+        filter_fields = dict((name, ('exact', 'in'))
+            for name in filter_fields)
+
+    filters = {}
+    for name, lookups in filter_fields.items():
+        unknown = set(lookups) - set(FILTER_LOOKUPS)
+        if unknown:
+            raise ImproperlyConfigured('Unsupported lookups for %s: %s' %
+                (name, ', '.join(sorted(unknown))))
+        filters[name] = (_get_field(endpoint, name), frozenset(lookups))
+
+    ordering = set()
+    for name in endpoint.ordering_fields or ():
+        field = _get_field(endpoint, name)
+        # The cursors can't represent NULL positions
+        if endpoint.pagination == 'cursor' and field.null:
+            raise ImproperlyConfigured('Cursor ordering field %s must not '
+                'be nullable' % name)
+        ordering.add(name)
+
+    specs = _filter_specs[cls] = (filters, ordering)
+    return specs
+
+
+def _filter_value(field, lookup, value, param):
+    try:
+        if lookup == 'isnull':
+            value = value.lower()
+            if value not in ('true', 'false', '1', '0'):
+                raise ValueError(value)
+            return value in ('true', '1')
+        elif lookup in ('in', 'range'):
+            values = [field.to_python(v) for v in value.split(',')]
+            if lookup == 'range' and len(values) != 2:
+                raise ValueError(value)
+            return values
+        else:
+            return field.to_python(value)
+    except (ValidationError, ValueError, TypeError):
+        raise HttpError(400, 'Invalid value for %s' % param)
+
+
+def _filter_lookups(endpoint, params):
+    filters = _get_filter_specs(endpoint)[0]
+    lookups = {}
+    for param, value in params.items():
+        name, _, lookup = param.partition('__')
+        if name not in filters:
+            continue
+        field, allowed = filters[name]
+        lookup = lookup or 'exact'
+        if lookup not in allowed:
+            raise HttpError(400, 'Invalid filter: %s' % param)
+        lookups['%s__%s' % (name, lookup)] = _filter_value(field, lookup,
+            value, param)
+    return lookups
+
+
+def _list_param(request, name):
+    value = request.params.get(name)
+    return [v for v in value.split(',') if v] if value else []
+
+
+def _load_fieldset(qs, fieldset, required=()):
+    # Load just the columns and related objects needed for the fieldset
+    if not fieldset:
+        return qs
+    return _optimize_query_set(qs, _Spec(**fieldset), required=required)
+
+
+def _bulk_insert_sets_pks(model, using):
+    # bulk_create only sets the primary keys of the created objects on some
+    # databases, and doesn't support multi-table inheritance
+    if model._meta.parents:
+        return False
+    features = connections[using].features
+    return getattr(features, 'can_return_rows_from_bulk_insert',
+        getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+
+def _batch_unique_errors(model, items):
+    # The items are validated one by one, so the unique checks done by the
+    # forms don't catch duplicates within the batch
+    meta = model._meta
+    checks = [(f.name,) for f in meta.concrete_fields if f.unique]
+    checks.extend(tuple(names) for names in meta.unique_together)
+    checks.extend(tuple(c.fields) for c in
+        getattr(meta, 'total_unique_constraints', ()))
+
+    errors = {}
+    for names in checks:
+        attnames = [meta.get_field(name).attname for name in names]
+        seen = {}
+        for i, obj in items:
+            value = tuple(getattr(obj, name) for name in attnames)
+            if None in value:
+                continue
+            if value not in seen:
+                seen[value] = i
+                continue
+            message = 'Duplicate of item %d' % seen[value]
+            key = names[0] if len(names) == 1 else '__all__'
+            errors.setdefault(str(i), {}).setdefault(key, []).append(
+                message)
+    return errors
+
+
+def _write_db(qs):
+    return qs._db or router.db_for_write(qs.model)
+
+
+def _changes_form(form, model, changes, many_to_many=False):
+    # A form with just the changed fields, validating them on their own
+    if not isinstance(changes, dict) or not changes:
+        raise HttpError(400, 'Invalid Data')
+
+    Form = _get_form(form, model)
+    for name in changes:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if (name not in Form.base_fields or field is None or
+                not field.concrete or field.primary_key or
+                (field.many_to_many and not many_to_many)):
+            raise HttpError(400, 'Invalid field: %s' % name)
+    return modelform_factory(model, form=Form, fields=list(changes))
+
+
+def _touch_auto_now(instance):
+    # save(update_fields=...) and update() leave out the auto_now fields
+    return [f.name for f in instance._meta.concrete_fields
+        if getattr(f, 'auto_now', False) and f.pre_save(instance, False)]
+
+
+def _page_url(request, params):
+    query = request.GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return request.build_absolute_uri('%s?%s' % (request.path,
+        query.urlencode()))
+
+
+class _FieldsetMixin(object):
+    #: Fields the client can select with the `fields` query parameter
+    sparse_fields = None
+    #: Related objects the client can add with the `include` query
+    #: parameter (dict mapping names to nested serialize() options)
+    sparse_include = None
+
+    def get_fieldset(self, request):
+        """Return the serialize() options for the fields requested by the
+        client using the `fields` and `include` query parameters.
+
+        If the client hasn't requested specific fields, all the model fields
+        are serialized (plus the requested related objects). Fields and
+        relations not listed in `sparse_fields` and `sparse_include`
+        result in a 400 error.
+        """
+
+        fieldset = {}
+        if self.sparse_fields is not None:
+            fields = _list_param(request, 'fields')
+            for name in fields:
+                if name not in self.sparse_fields:
+                    raise HttpError(400, 'Invalid field: %s' % name)
+            if fields:
+                fieldset['fields'] = fields
+
+        if self.sparse_include is not None:
+            include = _list_param(request, 'include')
+            for name in include:
+                if name not in self.sparse_include:
+                    raise HttpError(400, 'Invalid include: %s' % name)
+            if include:
+                fieldset['include'] = [(name, self.sparse_include[name])
+                    for name in include]
+
+        return fieldset
+
+    def _request_fieldset(self):
+        request = getattr(self, 'request', None)
+        return self.get_fieldset(request) if request is not None else {}
+
+
+class _ConditionalMixin(object):
+    #: Model field holding the object version or modification time, used
+    #: for conditional GET requests
+    version_field = None
+
+    def _check_version(self, request, version, timestamp=True):
+        # The query string is part of the ETag, as it changes the response
+        key = '%s|%s' % (request.META.get('QUERY_STRING', ''),
+            '|'.join('%s' % (v,) for v in version))
+        etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+        last_modified = None
+        if timestamp and isinstance(version[0], datetime.datetime):
+            last_modified = calendar.timegm(version[0].utctimetuple())
+
+        response = get_conditional_response(request, etag=etag,
+            last_modified=last_modified)
+        return response, (etag, last_modified)
+
+    def _add_validators(self, response, validators):
+        response = self._make_response(response)
+        etag, last_modified = validators
+        if last_modified is not None and \
+                not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(last_modified)
+        if not response.has_header('ETag'):
+            response['ETag'] = etag
+        return response
+
+
+class ListEndpoint(_FieldsetMixin, _ConditionalMixin, Endpoint):
     """
     List :py:class:`restless.views.Endpoint` supporting getting a list of
     objects and creating a new one. The endpoint exports two view methods by
@@ -41,12 +319,123 @@ class ListEndpoint(Endpoint):
 
     You can restrict the HTTP methods available by specifying the `methods`
     class variable.
+
+    The client can filter the list using query parameters for the fields
+    listed in `filter_fields`, either as a list of field names (allowing
+    exact and "in" lookups) or a dictionary mapping field names to the
+    allowed lookups (see :py:data:`FILTER_LOOKUPS`). The parameters use
+    the Django lookup syntax, for example `?author=1`, `?price__gte=10`,
+    `?id__in=1,2,3`, `?id__range=1,10` or `?publisher__isnull=true`. The
+    values are validated and converted using the model field, and invalid
+    values or lookups that aren't allowed result in a 400 error. Similarly,
+    the client can order the list with `?ordering=-price,id` using the
+    fields listed in `ordering_fields` (if not set, the parameter is left
+    alone, for example for a custom get_query_set).
+
+    To avoid letting the clients run full table scans, the filter and
+    ordering fields must be indexed (primary keys, unique fields, foreign
+    keys, fields with `db_index` or leading a multi-column index), or
+    ImproperlyConfigured is raised. Set `require_indexed_filters` to False
+    to disable the check.
+
+    Clients can ask for a subset of the fields with the `fields` query
+    parameter (eg. `?fields=id,name`), limited to the fields listed in
+    `sparse_fields`, and for related objects with the `include` query
+    parameter, limited to the relations in `sparse_include` (a dictionary
+    mapping relation names to the serialize() options for the related
+    objects). Only the requested columns and relations are loaded from the
+    database. If you override the `serialize` method, pass the options
+    returned by `get_fieldset(request)` to
+    :py:func:`restless.models.serialize` to support this.
+
+    If `bulk` is set to True, the client can also create many objects at
+    once, by posting a JSON array of objects (at most `max_bulk_size`). Each
+    of them is validated using the form, and if any are invalid, nothing is
+    created and the errors are returned in a dictionary keyed by the array
+    index. Otherwise, the objects are inserted using `bulk_create` (in
+    batches of `bulk_batch_size`), in a single transaction. Note that
+    `bulk_create` doesn't call the model `save` method or send the
+    `pre_save` and `post_save` signals. The response contains the list of
+    the created objects, or just their primary keys if `bulk_compact`
+    is set.
+
+    If "PATCH" and "DELETE" are added to `methods`, the client can also
+    update or delete many objects at once. The objects are selected by the
+    query parameters: either `ids` (a comma-separated list of primary keys)
+    or the filters allowed by `filter_fields` (see above); one of them is
+    required. The PATCH request body is a dictionary of changes applied to
+    all the selected objects, validated using the form (but only the
+    changed fields). By default, each object is updated and saved in turn,
+    so the model `save` method and signals are called. If the endpoint sets
+    `bulk_skip_signals`, a single UPDATE query is run instead. The
+    responses contain the number of updated or deleted objects.
+
+    If `version_field` is set to a model field holding the modification
+    time of the objects (eg. a DateTimeField with `auto_now`), the endpoint
+    supports conditional GET requests. Before fetching the objects, the
+    latest modification time and the number of the (filtered) objects are
+    looked up with a single aggregate query (see `get_version`), and if the
+    `ETag` the client got before still matches, a 304 response is returned
+    without loading and serializing the objects. The lists don't have a
+    `Last-Modified` header, as the latest modification time doesn't change
+    when objects are deleted.
+
+    By default, the list isn't paginated. Set the `pagination` class
+    attribute to "cursor" to use keyset pagination (see
+    :py:func:`restless.pagination.cursor_page`): the objects are ordered by
+    the `ordering` fields, and the client gets the links to the next and
+    previous pages with opaque cursors in them. Set it to "offset" to use
+    `limit` and `offset` query parameters instead (see
+    :py:func:`restless.pagination.offset_page`); in that case,
+    `pagination_count` can be set to True (or "approximate") to also
+    return the total number of objects.
+
+    The client can choose the page size using the `limit` query parameter,
+    up to `max_page_size` (by default, `page_size` objects are returned).
+    The page is returned in an envelope, as a dictionary with "results",
+    "next" and "previous" (and optionally "count") keys. If
+    `pagination_headers` is set, the response contains just the list
+    of objects, and the links (and count) are sent in the "Link" (and
+    "X-Total-Count") headers instead.
     """
 
     model = None
     form = None
     methods = ['GET', 'POST']
 
+    #: Whether the client can create many objects in one request
+    bulk = False
+    #: Number of objects inserted in one query
+    bulk_batch_size = 500
+    #: Maximum number of objects that can be created in one request
+    max_bulk_size = 10000
+    #: Whether to return just the primary keys of the created objects
+    bulk_compact = False
+    #: Whether bulk updates can skip saving each object (and sending signals)
+    bulk_skip_signals = False
+
+    #: Fields the client can filter by (list, or dict mapping field names
+    #: to allowed lookups)
+    filter_fields = None
+    #: Fields the client can order by
+    ordering_fields = None
+    #: Whether filter and ordering fields must be indexed
+    require_indexed_filters = True
+
+    #: Pagination mode: None (no pagination), "cursor" or "offset"
+    pagination = None
+    #: Fields to order the objects by, for cursor pagination
+    ordering = ('pk',)
+    #: Default number of objects per page
+    page_size = 50
+    #: Maximum number of objects per page the client can request
+    max_page_size = 500
+    #: Whether to return the number of objects with offset pagination
+    #: (True, False or "approximate")
+    pagination_count = False
+    #: Whether to return pagination links in headers instead of envelope
+    pagination_headers = False
+
     def get_query_set(self, request, *args, **kwargs):
         """Return a QuerySet that this endpoint represents.
 
@@ -73,7 +462,7 @@ class ListEndpoint(Endpoint):
         method to customize the serialization.
         """
 
-        return serialize(objs)
+        return serialize(objs, **self._request_fieldset())
 
     def get(self, request, *args, **kwargs):
         """Return a serialized list of objects in this endpoint."""
@@ -82,14 +471,134 @@ class ListEndpoint(Endpoint):
             raise HttpError(405, 'Method Not Allowed')
 
         qs = self.get_query_set(request, *args, **kwargs)
+        qs = self.filter_query_set(request, qs)
+        if not self.version_field:
+            return self._get_list(request, qs)
+
+        # Deleting an older object doesn't change the latest modification
+        # time, so only the ETag (which includes the count) is used
+        response, validators = self._check_version(request,
+            self.get_version(request, qs), timestamp=False)
+        if response is None:
+            response = self._get_list(request, qs)
+        return self._add_validators(response, validators)
+
+    def _get_list(self, request, qs):
+        if self.pagination:
+            return self.paginate(request, qs)
         return self.serialize(qs)
 
+    def get_version(self, request, qs):
+        """Return the version of the list, for conditional GET requests.
+
+        By default, returns the latest `version_field` value of the objects
+        in the QuerySet (as filtered by the client) and their count, so
+        updated, added or deleted objects all change the version.
+        """
+
+        result = qs.order_by().aggregate(latest=Max(self.version_field),
+            count=Count('pk'))
+        return (result['latest'], result['count'])
+
+    def filter_query_set(self, request, qs):
+        """Apply the filters and ordering requested by the client.
+
+        Query parameters that don't refer to the fields in `filter_fields`
+        are ignored.
+        """
+
+        lookups = _filter_lookups(self, request.params)
+        if lookups:
+            qs = qs.filter(**lookups)
+
+        # Cursor pagination applies the ordering itself
+        order = self.get_ordering(request)
+        if order and self.pagination != 'cursor':
+            qs = qs.order_by(*order)
+        return qs
+
+    def get_ordering(self, request):
+        """
+        Return the ordering requested by the client, or None. The
+        `ordering` parameter is only used if `ordering_fields` is set.
+        """
+
+        if not self.ordering_fields:
+            return None
+        value = request.params.get('ordering')
+        if not value:
+            return None
+
+        allowed = _get_filter_specs(self)[1]
+        order = value.split(',')
+        for name in order:
+            if (name[1:] if name.startswith('-') else name) not in allowed:
+                raise HttpError(400, 'Invalid ordering: %s' % name)
+        return order
+
+    def get_page(self, request, qs):
+        """Return the requested :py:class:`restless.pagination.Page`."""
+
+        limit = _int_param(request, 'limit', self.page_size)
+        if limit < 1:
+            raise HttpError(400, 'Invalid limit')
+        limit = min(limit, self.max_page_size)
+
+        fieldset = self.get_fieldset(request)
+        if self.pagination == 'cursor':
+            # The cursors are made from the ordering fields, so load them too
+            ordering = self.get_ordering(request) or self.ordering
+            qs = _load_fieldset(qs, fieldset,
+                [name.lstrip('-') for name in ordering])
+            return cursor_page(qs, ordering, limit,
+                request.params.get('cursor'))
+        elif self.pagination == 'offset':
+            offset = _int_param(request, 'offset', 0)
+            if offset < 0:
+                raise HttpError(400, 'Invalid offset')
+            return offset_page(_load_fieldset(qs, fieldset), limit, offset,
+                count=self.pagination_count)
+        else:
+            raise ImproperlyConfigured('Unknown pagination: %s' %
+                self.pagination)
+
+    def paginate(self, request, qs):
+        """Return the response with a page of serialized objects."""
+
+        page = self.get_page(request, qs)
+        results = self.serialize(page.objects)
+        links = [(rel, _page_url(request, params)) for rel, params in
+            [('next', page.next), ('prev', page.previous)] if params]
+
+        if self.pagination_headers:
+            response = Http200(results)
+            if links:
+                response['Link'] = ', '.join('<%s>; rel="%s"' % (url, rel)
+                    for rel, url in links)
+            if page.count is not None:
+                response['X-Total-Count'] = str(page.count)
+            return response
+
+        links = dict(links)
+        data = {
+            'results': results,
+            'next': links.get('next'),
+            'previous': links.get('prev'),
+        }
+        if page.count is not None:
+            data['count'] = page.count
+            data['count_approximate'] = page.count_approximate
+        return data
+
     def post(self, request, *args, **kwargs):
         """Create a new object."""
 
         if 'POST' not in self.methods:
             raise HttpError(405, 'Method Not Allowed')
 
+        if isinstance(request.data, list):
+            return Http201(self.create_objects(request, request.data))
+
         Form = _get_form(self.form, self.model)
         form = Form(request.data or None, request.FILES)
         if form.is_valid():
@@ -98,8 +607,134 @@ class ListEndpoint(Endpoint):
             
         raise HttpError(400, 'Invalid Data', errors=form.errors)
 
+    def patch(self, request, *args, **kwargs):
+        """Update the objects selected by the query parameters."""
+
+        if 'PATCH' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        qs = self.get_query_set(request, *args, **kwargs)
+        return self.update_objects(request, qs)
+
+    def delete(self, request, *args, **kwargs):
+        """Delete the objects selected by the query parameters."""
+
+        if 'DELETE' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
 
-class DetailEndpoint(Endpoint):
+        qs = self.get_query_set(request, *args, **kwargs)
+        return self.delete_objects(request, qs)
+
+    def select_objects(self, request, qs):
+        """Return the objects selected for a bulk update or delete."""
+
+        lookups = _filter_lookups(self, request.params)
+        ids = _list_param(request, 'ids')
+        if ids:
+            pk = qs.model._meta.pk
+            lookups['pk__in'] = _filter_value(pk, 'in', ','.join(ids), 'ids')
+        if not lookups:
+            raise HttpError(400, 'No objects selected')
+        return qs.filter(**lookups)
+
+    def update_objects(self, request, qs):
+        """Apply the changes in the request body to the selected objects."""
+
+        changes = request.data
+        Form = _changes_form(self.form, qs.model, changes)
+        form = Form(changes)
+        if not form.is_valid():
+            raise HttpError(400, 'Invalid Data', errors=form.errors)
+        values = dict((name, form.cleaned_data[name]) for name in changes)
+        # Stamp the auto_now fields too, like a regular save would
+        stub = qs.model()
+        for name in _touch_auto_now(stub):
+            values.setdefault(name, getattr(stub, name))
+
+        qs = self.select_objects(request, qs)
+        using = _write_db(qs)
+        with transaction.atomic(using=using):
+            if self.bulk_skip_signals:
+                # The caches are told about the updated objects instead
+                pks = None
+                if objects_changed.has_listeners(qs.model):
+                    pks = list(qs.values_list('pk', flat=True))
+                count = qs.update(**values)
+                if pks:
+                    objects_changed.send(sender=qs.model, pks=pks,
+                        using=using)
+            else:
+                count = 0
+                for obj in qs.select_for_update():
+                    for name, value in values.items():
+                        setattr(obj, name, value)
+                    obj.save(update_fields=list(values))
+                    count += 1
+        return {'updated': count}
+
+    def delete_objects(self, request, qs):
+        """Delete the selected objects (and the ones depending on them)."""
+
+        qs = self.select_objects(request, qs)
+        with transaction.atomic(using=_write_db(qs)):
+            deleted = qs.delete()[1]
+        return {'deleted': deleted.get(qs.model._meta.label, 0)}
+
+    def create_objects(self, request, items):
+        """Validate and create a list of objects (see `bulk`), returning
+        their serialized data or primary keys."""
+
+        if not self.bulk:
+            raise HttpError(400, 'Invalid Data')
+        if len(items) > self.max_bulk_size:
+            raise HttpError(400, 'Too many objects (at most %d allowed)' %
+                self.max_bulk_size)
+
+        Form = _get_form(self.form, self.model)
+        forms, errors = [], {}
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[str(i)] = {'__all__': ['Expected an object']}
+                continue
+            form = Form(item)
+            if form.is_valid():
+                forms.append((i, form))
+            else:
+                errors[str(i)] = form.errors
+        if errors:
+            raise HttpError(400, 'Invalid Data', errors=errors)
+
+        model = Form._meta.model
+        errors = _batch_unique_errors(model,
+            [(i, form.instance) for i, form in forms])
+        if errors:
+            raise HttpError(400, 'Invalid Data', errors=errors)
+
+        using = router.db_for_write(model)
+        objs = [form.save(commit=False) for i, form in forms]
+        try:
+            with transaction.atomic(using=using):
+                if _bulk_insert_sets_pks(model, using):
+                    model._default_manager.db_manager(using).bulk_create(
+                        objs, batch_size=self.bulk_batch_size)
+                    # Without the signals, tell the caches instead
+                    objects_changed.send(sender=model,
+                        pks=[obj.pk for obj in objs], using=using)
+                else:
+                    for obj in objs:
+                        obj.save(using=using)
+                for i, form in forms:
+                    form.save_m2m()
+        except IntegrityError:
+            # Conflicting with rows created since the validation
+            raise HttpError(400, 'Conflicting Data')
+
+        if self.bulk_compact:
+            return [obj.pk for obj in objs]
+        return self.serialize(objs)
+
+
+class DetailEndpoint(_FieldsetMixin, _ConditionalMixin, Endpoint):
     """
     Detail :py:class:`restless.views.Endpoint` supports getting a single
     object from the database (HTTP GET), updating it (HTTP PUT) and deleting
@@ -116,11 +751,38 @@ class DetailEndpoint(Endpoint):
     You can restrict the HTTP methods available by specifying the `methods`
     class variable.
 
+    PATCH (if added to `methods`) updates just the fields sent by the
+    client: only they are validated (using the form), and only the changed
+    ones are saved. If `patch_without_lookup` is set (which requires the
+    primary key as the `lookup_field`), the object isn't loaded at all, and
+    the changes are saved with a single UPDATE query instead. This bypasses
+    get_instance(), the model `save` method and signals, and the form and
+    model clean() methods only see the changed fields, so only use it if
+    they don't need the rest of the object.
+
+    The `fields` and `include` query parameters can be used to get a subset
+    of the object fields, or related objects, in the same way as for
+    :py:class:`ListEndpoint`.
+
+    To avoid loading frequently requested objects from the database every
+    time, set `instance_cache` to a :py:class:`restless.cache.InstanceCache`
+    for the model (with the same `lookup_field`).
+
+    If `version_field` is set to a model field holding the version number or
+    the modification time of the object, the endpoint supports conditional
+    GET requests: just that field is looked up first (see `get_version`),
+    and if the `ETag` or `Last-Modified` the client got before still match,
+    a 304 response is returned without loading the whole object.
+
     """
     model = None
     form = None
     lookup_field = 'pk'
     methods = ['GET', 'PUT', 'DELETE']
+    #: Whether PATCH can update the object without loading it first
+    patch_without_lookup = False
+    #: :py:class:`restless.cache.InstanceCache` used by get_instance()
+    instance_cache = None
 
     def get_instance(self, request, *args, **kwargs):
         """Return a model instance represented by this endpoint.
@@ -130,7 +792,10 @@ class DetailEndpoint(Endpoint):
         to the url argument.
 
         By default, the primary key keyword argument name is `pk`. This can
-        be overridden by setting the `lookup_field` class attribute.
+        be overridden by setting the `lookup_field` class attribute. If
+        `instance_cache` is set, the instance is looked up in the cache
+        first for GET and HEAD requests (other requests, which may change
+        the instance, always load it from the database).
 
         You can override the method to provide custom behaviour. The `args`
         and `kwargs` parameters are passed in directly from the URL pattern
@@ -142,8 +807,15 @@ class DetailEndpoint(Endpoint):
         """
 
         if self.model and self.lookup_field in kwargs:
+            if (self.instance_cache is not None and
+                    request.method in ('GET', 'HEAD')):
+                return self._get_cached_instance(kwargs[self.lookup_field])
+
+            qs = self.model.objects.all()
+            if request.method == 'GET':
+                qs = _load_fieldset(qs, self.get_fieldset(request))
             try:
-                return self.model.objects.get(**{
+                return qs.get(**{
                     self.lookup_field: kwargs.get(self.lookup_field)
                 })
             except self.model.DoesNotExist:
@@ -151,6 +823,18 @@ class DetailEndpoint(Endpoint):
         else:
             raise HttpError(404, 'Resource Not Found')
 
+    def _get_cached_instance(self, value):
+        cache = self.instance_cache
+        if (cache.model is not self.model or
+                cache.lookup_field != self.lookup_field):
+            raise ImproperlyConfigured('The instance cache must be for the '
+                'same model and lookup field as the endpoint')
+
+        instance = cache.get(value)
+        if instance is None:
+            raise HttpError(404, 'Resource Not Found')
+        return instance
+
     def serialize(self, obj):
         """Serialize the object in the response.
 
@@ -159,7 +843,7 @@ class DetailEndpoint(Endpoint):
         method to customize the serialization.
         """
 
-        return serialize(obj)
+        return serialize(obj, **self._request_fieldset())
 
     def get(self, request, *args, **kwargs):
         """Return the serialized object represented by this endpoint."""
@@ -167,7 +851,31 @@ class DetailEndpoint(Endpoint):
         if 'GET' not in self.methods:
             raise HttpError(405, 'Method Not Allowed')
 
-        return self.serialize(self.get_instance(request, *args, **kwargs))
+        if not self.version_field:
+            return self.serialize(self.get_instance(request, *args, **kwargs))
+
+        response, validators = self._check_version(request,
+            self.get_version(request, *args, **kwargs))
+        if response is None:
+            response = self.serialize(self.get_instance(request, *args,
+                **kwargs))
+        return self._add_validators(response, validators)
+
+    def get_version(self, request, *args, **kwargs):
+        """Return the version of the object, for conditional GET requests.
+
+        By default, looks up just the `version_field` of the object, the
+        same way get_instance() finds it. If you override get_instance(),
+        you may want to override this method too.
+        """
+
+        if self.model and self.lookup_field in kwargs:
+            versions = self.model.objects.filter(**{
+                self.lookup_field: kwargs.get(self.lookup_field)
+            }).values_list(self.version_field, flat=True)[:1]
+            for version in versions:
+                return (version,)
+        raise HttpError(404, 'Resource Not Found')
 
     def put(self, request, *args, **kwargs):
         """Update the object represented by this endpoint."""
@@ -184,6 +892,62 @@ class DetailEndpoint(Endpoint):
             return Http200(self.serialize(obj))
         raise HttpError(400, 'Invalid data', errors=form.errors)
 
+    def patch(self, request, *args, **kwargs):
+        """Update some fields of the object represented by this endpoint."""
+
+        if 'PATCH' not in self.methods:
+            raise HttpError(405, 'Method Not Allowed')
+
+        if self.patch_without_lookup:
+            return self._patch_without_lookup(request, kwargs)
+        instance = self.get_instance(request, *args, **kwargs)
+        return self._patch_instance(request, instance)
+
+    def _patch_instance(self, request, instance):
+        Form = _changes_form(self.form, self.model, request.data,
+            many_to_many=True)
+        form = Form(request.data, instance=instance)
+        if not form.is_valid():
+            raise HttpError(400, 'Invalid data', errors=form.errors)
+
+        meta = instance._meta
+        changed = [name for name in form.changed_data
+            if not meta.get_field(name).many_to_many]
+        obj = form.save(commit=False)
+        if changed:
+            obj.save(update_fields=changed + _touch_auto_now(obj))
+        form.save_m2m()
+        return Http200(self.serialize(obj))
+
+    def _patch_without_lookup(self, request, kwargs):
+        if not self.model or self.lookup_field not in kwargs:
+            raise HttpError(404, 'Resource Not Found')
+
+        # The form validates the changes against a stub object, so the
+        # unique checks still exclude the object itself (which they do by
+        # the primary key, so it must be the lookup field)
+        if self.lookup_field not in ('pk', self.model._meta.pk.name):
+            raise ImproperlyConfigured('patch_without_lookup requires the '
+                'primary key as the lookup_field')
+        lookup = {self.lookup_field: kwargs[self.lookup_field]}
+        stub = self.model(**lookup)
+        stub._state.adding = False
+        Form = _changes_form(self.form, self.model, request.data)
+        form = Form(request.data, instance=stub)
+        if not form.is_valid():
+            raise HttpError(400, 'Invalid data', errors=form.errors)
+
+        values = dict((name, form.cleaned_data[name])
+            for name in request.data)
+        for name in _touch_auto_now(stub):
+            values[name] = getattr(stub, name)
+        if not self.model._default_manager.filter(**lookup).update(**values):
+            raise HttpError(404, 'Resource Not Found')
+        # The update doesn't send the signals the caches rely on
+        objects_changed.send(sender=self.model, pks=[stub.pk],
+            using=router.db_for_write(self.model))
+        return {}
+
     def delete(self, request, *args, **kwargs):
         """Delete the object represented by this endpoint."""
 
@@ -0,0 +1,203 @@
+"""
+Pagination of QuerySets, as used by
+:py:class:`restless.modelviews.ListEndpoint`.
+"""
+
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Q
+
+from .http import HttpError
+
+__all__ = ['Page', 'cursor_page', 'offset_page', 'approximate_count']
+
+_CURSOR_SALT = 'restless.pagination.cursor'
+
+
+class Page(object):
+    """
+    A page of objects. The `next` and `previous` attributes hold the query
+    parameters for requesting the next and the previous page (or None if
+    there's no such page), and `count` the total number of objects (if
+    requested).
+    """
+
+    def __init__(self, objects, next=None, previous=None, count=None,
+            count_approximate=False):
+        self.objects = objects
+        self.next = next
+        self.previous = previous
+        self.count = count
+        self.count_approximate = count_approximate
+
+
+def _ordering_fields(model, ordering):
+    fields = []
+    for name in ordering:
+        desc = name.startswith('-')
+        name = name.lstrip('-')
+        if name == 'pk':
+            field = model._meta.pk
+        else:
+            field = model._meta.get_field(name)
+        if field.null:
+            raise ImproperlyConfigured('Cursor ordering field %s must not '
+                'be nullable' % name)
+        fields.append((field, desc))
+
+    # The last key must be unique, so each object has a distinct position
+    if not any(field.primary_key for field, desc in fields):
+        fields.append((model._meta.pk, False))
+    return fields
+
+
+def _cursor_salt(fields):
+    # Cursors are only valid for the ordering they were created with
+    return '%s:%s' % (_CURSOR_SALT, ','.join(('-' if desc else '') +
+        field.name for field, desc in fields))
+
+
+def _dump_cursor(direction, fields, keys):
+    return {'cursor': signing.dumps([direction, keys],
+        salt=_cursor_salt(fields), compress=True)}
+
+
+def _object_keys(fields, obj):
+    return [field.value_to_string(obj) for field, desc in fields]
+
+
+def _load_cursor(cursor, fields):
+    try:
+        direction, keys = signing.loads(cursor, salt=_cursor_salt(fields))
+        if direction not in ('n', 'p') or len(keys) != len(fields):
+            raise ValueError(cursor)
+        values = [field.to_python(key)
+            for (field, desc), key in zip(fields, keys)]
+    except Exception:
+        raise HttpError(400, 'Invalid cursor')
+    return direction, keys, values
+
+
+def _keyset_filter(fields, values, reverse):
+    # (a, b) > (x, y) is a > x OR (a = x AND b > y), with > swapped for <
+    # on descending keys (and on all the keys when paging backwards)
+    q = Q()
+    for i, ((field, desc), value) in enumerate(zip(fields, values)):
+        op = 'lt' if desc != reverse else 'gt'
+        cond = Q(**{'%s__%s' % (field.name, op): value})
+        for (prev, _), prev_value in zip(fields[:i], values[:i]):
+            cond &= Q(**{prev.name: prev_value})
+        q |= cond
+    return q
+
+
+def cursor_page(qs, ordering, limit, cursor=None):
+    """
+    Return a :py:class:`Page` of at most `limit` objects from the QuerySet,
+    using keyset pagination: the objects are ordered by the `ordering`
+    fields (model fields, optionally prefixed with "-" for descending
+    order), and the position in the list is recorded in the (opaque and
+    signed) cursor, as the values of the ordering fields of the object at
+    the boundary. The primary key is added to the ordering if needed, so
+    the position is always unique. The ordering fields must not be
+    nullable (ImproperlyConfigured is raised otherwise).
+
+    Unlike with OFFSET, the cost of getting a page doesn't depend on the
+    number of objects before it (given an index on the ordering fields),
+    and the objects added or removed while paging don't cause the other
+    objects to be skipped or repeated.
+    """
+
+    fields = _ordering_fields(qs.model, ordering)
+    direction, keys, values = 'n', None, None
+    if cursor:
+        direction, keys, values = _load_cursor(cursor, fields)
+
+    reverse = direction == 'p'
+    qs = qs.order_by(*[('-' if desc != reverse else '') + field.name
+        for field, desc in fields])
+    if values is not None:
+        qs = qs.filter(_keyset_filter(fields, values, reverse))
+
+    objs = list(qs[:limit + 1])
+    more = len(objs) > limit
+    objs = objs[:limit]
+    if reverse:
+        objs.reverse()
+
+    # When paging forward, there's a previous page if we started from a
+    # cursor, and a next one if there are more objects (and vice versa)
+    if reverse:
+        has_next, has_previous = True, more
+    else:
+        has_next, has_previous = more, keys is not None
+
+    page = Page(objs)
+    if objs:
+        if has_next:
+            page.next = _dump_cursor('n', fields,
+                _object_keys(fields, objs[-1]))
+        if has_previous:
+            page.previous = _dump_cursor('p', fields,
+                _object_keys(fields, objs[0]))
+    elif keys is not None:
+        # Past the end (or the start), so the cursor is the boundary
+        if reverse:
+            page.next = _dump_cursor('n', fields, keys)
+        else:
+            page.previous = _dump_cursor('p', fields, keys)
+    return page
+
+
+def approximate_count(qs, limit=10000):
+    """
+    Return a (count, approximate) tuple with the number of objects in the
+    QuerySet, without counting more than `limit` of them.
+
+    On PostgreSQL, the table size estimate kept by the database is used for
+    unfiltered QuerySets of large tables. Otherwise, if there are more than
+    `limit` objects, `limit` is returned as an approximate count.
+    """
+
+    query = qs.query
+    connection = connections[qs.db]
+    if (connection.vendor == 'postgresql' and not query.where and
+            not query.distinct and not getattr(query, 'combinator', None)):
+        table = connection.ops.quote_name(qs.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class '
+                'WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+        if row is not None and row[0] >= limit:
+            return int(row[0]), True
+
+    count = qs[:limit + 1].count()
+    if count > limit:
+        return limit, True
+    return count, False
+
+
+def offset_page(qs, limit, offset=0, count=False):
+    """
+    Return a :py:class:`Page` of at most `limit` objects from the QuerySet,
+    starting at `offset`. If `count` is True, the total number of objects is
+    also counted; if it's "approximate", it's estimated using
+    :py:func:`approximate_count`.
+    """
+
+    if not qs.ordered:
+        qs = qs.order_by('pk')
+
+    objs = list(qs[offset:offset + limit + 1])
+    page = Page(objs[:limit])
+    if len(objs) > limit:
+        page.next = {'offset': offset + limit}
+    if offset > 0:
+        page.previous = {'offset': max(offset - limit, 0)}
+
+    if count == 'approximate':
+        page.count, page.count_approximate = approximate_count(qs)
+    elif count:
+        page.count = qs.count()
+    return page
@@ -0,0 +1,205 @@
+"""
+Routing of the endpoint database queries to read replicas.
+
+Endpoints (see :py:class:`restless.views.Endpoint`) with the
+`read_databases` attribute set to a database alias (or a list of them)
+send the queries made while handling GET and HEAD requests to that
+database (or to one of them, picked at random for each request). The
+queries made while handling the other requests go to the primary
+database, `write_database` ("default" if not set). The routing is done by
+:py:class:`EndpointRouter`, which must be added to the `DATABASE_ROUTERS`
+setting. Endpoints with just `write_database` set use that database for
+all their queries.
+
+As the replicas may lag behind the primary, a client that has just made a
+successful write request is pinned to the primary for the next
+`primary_pin_timeout` seconds, so it gets to read its own writes. The pin
+is sent to the client both in a cookie and in the
+`X-Restless-Primary-Pin` response header; clients that don't keep cookies
+can send the header value back in the request header of the same name.
+
+The pin only covers the writes made through the endpoints, so the models of
+the apps listed in the `RESTLESS_PRIMARY_APPS` setting (by default,
+:py:data:`PRIMARY_APPS`: the users, groups, sessions and API tokens), and the
+user model, are always read from the primary database. Otherwise, a client
+that has just logged in (or got a token) could look anonymous to the next
+request reading from a lagging replica.
+"""
+
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+__all__ = ['EndpointRouter', 'current', 'route', 'PIN_COOKIE', 'PIN_HEADER',
+    'PRIMARY_APPS']
+
+#: Name of the cookie pinning the client to the primary database
+PIN_COOKIE = 'restless_primary_pin'
+#: Name of the header pinning the client to the primary database
+PIN_HEADER = 'X-Restless-Primary-Pin'
+
+#: Labels of the apps whose models are always read from the primary database
+PRIMARY_APPS = ('auth', 'sessions', 'restless_authtoken')
+
+_PIN_META = 'HTTP_' + PIN_HEADER.upper().replace('-', '_')
+_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+if ContextVar is not None:
+    _current = ContextVar('restless_databases', default=None)
+
+    def current():
+        """
+        Return the (read, write) database aliases chosen by the endpoint
+        handling the current request, or None.
+        """
+        return _current.get()
+
+    def _activate(databases):
+        return _current.set(databases)
+
+    def _deactivate(token):
+        _current.reset(token)
+else:
+    _local = threading.local()
+
+    def current():
+        """
+        Return the (read, write) database aliases chosen by the endpoint
+        handling the current request, or None.
+        """
+        return getattr(_local, 'databases', None)
+
+    def _activate(databases):
+        previous = current()
+        _local.databases = databases
+        return previous
+
+    def _deactivate(previous):
+        _local.databases = previous
+
+
+def _is_pinned(request, timeout):
+    value = request.META.get(_PIN_META) or request.COOKIES.get(PIN_COOKIE)
+    if not value:
+        return False
+    try:
+        until = float(value)
+    except ValueError:
+        return False
+    # Pins from the future beyond the timeout weren't set by us
+    now = time.time()
+    return now < until <= now + timeout
+
+
+class _NullRoute(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def pin(self, response):
+        return response
+
+
+_null_route = _NullRoute()
+
+
+class _Route(object):
+    def __init__(self, endpoint, request):
+        self.timeout = endpoint.primary_pin_timeout or 0
+        self.write = request.method not in _SAFE_METHODS
+        self.primary = endpoint.write_database or DEFAULT_DB_ALIAS
+
+        replicas = endpoint.read_databases
+        if not replicas:
+            # Only the write database is set, so it's used for everything
+            self.database = self.primary
+            self.timeout = 0
+        elif self.write or _is_pinned(request, self.timeout):
+            self.database = self.primary
+        elif isinstance(replicas, (list, tuple)):
+            self.database = random.choice(replicas)
+        else:
+            self.database = replicas
+        self._token = None
+
+    def __enter__(self):
+        self._token = _activate((self.database, self.primary))
+
+    def __exit__(self, *exc_info):
+        _deactivate(self._token)
+
+    def _iterate(self, content):
+        # Streamed responses are generated after the view returns
+        iterator = iter(content)
+        while True:
+            token = _activate((self.database, self.primary))
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _deactivate(token)
+            yield chunk
+
+    def pin(self, response):
+        """Route the streamed content, and pin the client to the primary
+        after a successful write."""
+
+        if getattr(response, 'streaming', False):
+            response.streaming_content = self._iterate(
+                response.streaming_content)
+        if self.write and self.timeout and response.status_code < 400:
+            until = '%d' % (time.time() + self.timeout)
+            response.set_cookie(PIN_COOKIE, until, max_age=self.timeout,
+                httponly=True)
+            response[PIN_HEADER] = until
+        return response
+
+
+def route(endpoint, request):
+    """
+    Return a context manager routing the queries made while handling the
+    request to the databases chosen by the endpoint. Its `pin(response)`
+    method adds the primary database pin to the response, if needed.
+    """
+
+    if not endpoint.read_databases and not endpoint.write_database:
+        return _null_route
+    return _Route(endpoint, request)
+
+
+def _reads_primary(model):
+    meta = model._meta
+    apps = getattr(settings, 'RESTLESS_PRIMARY_APPS', PRIMARY_APPS)
+    return (meta.app_label in apps or
+        meta.label_lower == settings.AUTH_USER_MODEL.lower())
+
+
+class EndpointRouter(object):
+    """
+    Database router sending the queries to the databases chosen by the
+    endpoint handling the current request (except for the reads of the
+    authentication models, see above). Outside of the endpoints with read
+    replicas configured, it leaves the decision to the other routers.
+    """
+
+    def db_for_read(self, model, **hints):
+        databases = current()
+        if not databases:
+            return None
+        return databases[1] if _reads_primary(model) else databases[0]
+
+    def db_for_write(self, model, **hints):
+        databases = current()
+        return databases[1] if databases else None
@@ -0,0 +1,290 @@
+"""
+Per-phase timing of the endpoint request processing.
+
+When the `RESTLESS_TIMING` setting is True, the endpoints (see
+:py:class:`restless.views.Endpoint`) measure how long each request spent in
+the following phases:
+
+  * parse - parsing the request body (when request.data is accessed)
+  * auth - authentication (the authenticate method)
+  * handler - the view method itself, excluding the other phases
+  * serialize - :py:func:`restless.models.serialize` calls
+  * encode - JSON encoding in :py:class:`restless.http.JSONResponse`
+
+plus the total time spent in the endpoint. The phases don't overlap: time
+spent in a phase nested in another one (eg. serialization called from the
+view method) is only counted in the inner phase.
+
+The durations are passed to the metrics hook specified in the
+`RESTLESS_TIMING_HOOK` setting (a callable or a dotted path to it), which
+is called as `hook(endpoint, request, durations)`, where durations is a
+dictionary mapping phase names to durations in seconds. By default,
+:py:func:`record` is used, which stores the durations in the in-process
+histogram :py:data:`registry`. If the `RESTLESS_TIMING_HEADER` setting is
+True, the durations are also reported to the client in the `Server-Timing`
+response header.
+
+When timing is disabled (the default), the only overhead is a check of
+the (cached) setting and a lookup of the active timer for each phase.
+"""
+
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+__all__ = ['PHASES', 'Timings', 'Histogram', 'TimingRegistry', 'registry',
+    'current', 'phase', 'record']
+
+PHASES = ('parse', 'auth', 'handler', 'serialize', 'encode')
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_phase = _NullPhase()
+
+
+class _Phase(object):
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings._stack.append([self.name, _clock(), 0.0])
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        name, start, nested = timings._stack.pop()
+        elapsed = _clock() - start
+        timings.durations[name] = (timings.durations.get(name, 0.0) +
+            elapsed - nested)
+        if timings._stack:
+            timings._stack[-1][2] += elapsed
+
+
+class Timings(object):
+    """
+    Durations of the request processing phases, for a single request.
+
+    Used as a context manager, makes itself the active timer (see
+    :py:func:`current`) for the duration of the block and records the
+    total time spent in it.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self._stack = []
+        self._token = None
+
+    def phase(self, name):
+        """Return a context manager timing the named phase."""
+
+        return _Phase(self, name)
+
+    def __enter__(self):
+        self._token = _activate(self)
+        self._start = _clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.durations['total'] = _clock() - self._start
+        _deactivate(self._token)
+
+    def server_timing(self):
+        """Return the durations formatted as a Server-Timing header value."""
+
+        return ', '.join('%s;dur=%.3f' % (name, self.durations[name] * 1000)
+            for name in PHASES + ('total',) if name in self.durations)
+
+
+if ContextVar is not None:
+    _current = ContextVar('restless_timings', default=None)
+
+    def current():
+        """Return the active :py:class:`Timings` instance, if any."""
+        return _current.get()
+
+    def _activate(timings):
+        return _current.set(timings)
+
+    def _deactivate(token):
+        _current.reset(token)
+else:
+    _local = threading.local()
+
+    def current():
+        """Return the active :py:class:`Timings` instance, if any."""
+        return getattr(_local, 'timings', None)
+
+    def _activate(timings):
+        previous = current()
+        _local.timings = timings
+        return previous
+
+    def _deactivate(previous):
+        _local.timings = previous
+
+
+def phase(name):
+    """
+    Return a context manager timing the named phase of the request being
+    processed. If timing is disabled, the context manager does nothing.
+    """
+
+    timings = current()
+    if timings is None:
+        return _null_phase
+    return timings.phase(name)
+
+
+_settings = {}
+
+
+def _setting(name, default):
+    # Looking up a missing setting is relatively slow, so the values
+    # are cached (and cleared when changed in tests)
+    try:
+        return _settings[name]
+    except KeyError:
+        value = _settings[name] = getattr(settings, name, default)
+        return value
+
+
+def _clear_settings(setting, **kwargs):
+    _settings.pop(setting, None)
+
+
+setting_changed.connect(_clear_settings)
+
+
+def is_enabled():
+    return _setting('RESTLESS_TIMING', False)
+
+
+class Histogram(object):
+    """
+    Cumulative histogram of observed values (durations in seconds), with
+    fixed bucket upper bounds.
+    """
+
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """
+        Return the histogram state as a dictionary with the `count`, `sum`
+        and `buckets` (a list of (upper bound, cumulative count) pairs, the
+        last upper bound being infinity) keys.
+        """
+
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+
+class TimingRegistry(object):
+    """
+    In-process registry of histograms, one per endpoint and phase. Can be
+    scraped (for example, from a metrics view) using :py:meth:`snapshot`.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, phase, value):
+        with self._lock:
+            histogram = self._histograms.get((endpoint, phase))
+            if histogram is None:
+                histogram = self._histograms[(endpoint, phase)] = \
+                    Histogram(self.buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        """
+        Return a dictionary mapping (endpoint, phase) pairs to histogram
+        snapshots (see :py:meth:`Histogram.snapshot`).
+        """
+
+        with self._lock:
+            return dict((key, histogram.snapshot())
+                for key, histogram in self._histograms.items())
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+#: Default registry, used by :py:func:`record`
+registry = TimingRegistry()
+
+
+def endpoint_name(endpoint):
+    cls = type(endpoint)
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def record(endpoint, request, durations):
+    """Default metrics hook, storing the durations in :py:data:`registry`."""
+
+    name = endpoint_name(endpoint)
+    for phase_name, value in durations.items():
+        registry.observe(name, phase_name, value)
+
+
+_imported_hooks = {}
+
+
+def _get_hook():
+    hook = _setting('RESTLESS_TIMING_HOOK', record)
+    if hook is None or callable(hook):
+        return hook
+
+    if hook not in _imported_hooks:
+        from django.utils.module_loading import import_string
+        _imported_hooks[hook] = import_string(hook)
+    return _imported_hooks[hook]
+
+
+def report(endpoint, request, response, timings):
+    """Pass the request timings to the metrics hook and the client."""
+
+    hook = _get_hook()
+    if hook is not None:
+        hook(endpoint, request, timings.durations)
+    if _setting('RESTLESS_TIMING_HEADER', False):
+        response['Server-Timing'] = timings.server_timing()
@@ -4,14 +4,62 @@ from django.views.decorators.csrf import csrf_exempt
 
 from django.conf import settings
 from django.http import HttpResponse
-from .http import Http200, Http500, HttpError
+from django.http.request import RawPostDataException
+from django.http.response import HttpResponseBase
+from django.utils.functional import cached_property
+from .http import Http200, Http500, HttpError, StreamingJSONResponse
+from . import coalescing, routing, timing
 
 import traceback
+import types
 import json
 
 __all__ = ['Endpoint']
 
 
+class _RequestAttributes(object):
+    """
+    Restless request attributes, computed on first access and then stored
+    on the request (so subsequent accesses are plain attribute lookups,
+    and the attributes can still be set directly).
+    """
+
+    @cached_property
+    def params(self):
+        return dict((k, v) for (k, v) in self.GET.items())
+
+    @cached_property
+    def raw_data(self):
+        try:
+            return self.body
+        except RawPostDataException:
+            # Already read from the stream by the upload handlers
+            return None
+
+    @cached_property
+    def data(self):
+        try:
+            with timing.phase('parse'):
+                self._parse_body(self)
+        except Exception:
+            self.__dict__.pop('data', None)
+            raise
+        return self.__dict__.get('data')
+
+
+_request_classes = {}
+
+
+def _extend_request(request, parse_body):
+    cls = request.__class__
+    if not issubclass(cls, _RequestAttributes):
+        if cls not in _request_classes:
+            _request_classes[cls] = type(cls.__name__,
+                (_RequestAttributes, cls), {})
+        request.__class__ = _request_classes[cls]
+    request._parse_body = parse_body
+
+
 class Endpoint(View):
     """
     Class-based Django view that should be extended to provide an API
@@ -32,11 +80,23 @@ class Endpoint(View):
           either form submission or submitted application/json data payload
       * request.raw_data - string containing raw request body
 
+    The params, data and raw_data attributes are computed when they're first
+    accessed, so the request body isn't read or parsed unless the view needs
+    it. Note that this means that an invalid JSON payload results in a HTTP
+    400 error only when the data is accessed. Also, if the data has been
+    parsed from a multipart/form-data request first, the body has already
+    been consumed by Django's upload handlers, and raw_data is None.
+
     The view method should return either a HTTPResponse (for example, a
     redirect), or something else (usually a dictionary or a list). If something
     other than HTTPResponse is returned, it is first serialized into
     :py:class:`restless.http.JSONResponse` with a status code 200 (OK),
-    then returned.
+    then returned. If the method returns a generator (for example, one
+    returned by :py:func:`restless.models.iter_serialize`), the items it
+    yields are streamed to the client as a JSON array using
+    :py:class:`restless.http.StreamingJSONResponse`. Note that any errors
+    raised while the generator is being consumed can't be reported to the
+    client anymore, as the response is already being sent.
 
     The authenticate method should return either a HttpResponse, which will
     shortcut the rest of the request handling (the view method will not be
@@ -45,8 +105,28 @@ class Endpoint(View):
     Both methods can raise a :py:class:`restless.http.HttpError` exception
     instead of returning a HttpResponse, to shortcut the request handling and
     immediately return the error to the client.
+
+    To offload reads to database replicas, set `read_databases` to the
+    replica database alias (or a list of them); see :py:mod:`restless.routing`.
+
+    To cache the GET responses, set `response_cache` to a
+    :py:class:`restless.cache.ResponseCache` instance. To handle identical
+    concurrent GET requests only once, set `coalesce_requests` to True; see
+    :py:mod:`restless.coalescing`.
     """
 
+    #: Database alias (or list of aliases) for GET and HEAD requests
+    read_databases = None
+    #: Database alias for the other requests (None for "default"), and for
+    #: all the requests if read_databases isn't set
+    write_database = None
+    #: Seconds to read from the primary database after a client writes
+    primary_pin_timeout = 10
+    #: Cache for the GET responses (a restless.cache.ResponseCache)
+    response_cache = None
+    #: Share the response between identical concurrent GET requests
+    coalesce_requests = False
+
     @staticmethod
     def _parse_content_type(content_type):
         if ';' in content_type:
@@ -78,41 +158,96 @@ class Endpoint(View):
         else:
             request.data = request.body
 
+    @staticmethod
+    def _check_auth_response(auth_response):
+        if isinstance(auth_response, HttpResponse):
+            return auth_response
+        elif auth_response is None:
+            pass
+        else:
+            raise TypeError('authenticate method must return '
+                'HttpResponse instance or None')
+
     def _process_authenticate(self, request):
         if hasattr(self, 'authenticate') and callable(self.authenticate):
-            auth_response = self.authenticate(request)
+            return self._check_auth_response(self.authenticate(request))
 
-            if isinstance(auth_response, HttpResponse):
-                return auth_response
-            elif auth_response is None:
-                pass
-            else:
-                raise TypeError('authenticate method must return '
-                    'HttpResponse instance or None')
-
-    @method_decorator(csrf_exempt)
-    def dispatch(self, request, *args, **kwargs):
+    def _prepare_request(self, request):
         if not hasattr(request, 'content_type'):
             request.content_type = request.META.get('CONTENT_TYPE', 'text/plain')
-        request.params = dict((k, v) for (k, v) in request.GET.items())
-        request.data = None
-        request.raw_data = request.body
+        _extend_request(request, self._parse_body)
 
-        try:
-            self._parse_body(request)
-            authentication_required = self._process_authenticate(request)
-            if authentication_required:
-                return authentication_required
-
-            response = super(Endpoint, self).dispatch(request, *args, **kwargs)
-        except HttpError as err:
-            response = err.response
-        except Exception as ex:
-            if settings.DEBUG:
-                response = Http500(str(ex), traceback=traceback.format_exc())
-            else:
-                raise
-
-        if not isinstance(response, HttpResponse):
+    @staticmethod
+    def _make_response(response):
+        if isinstance(response, types.GeneratorType):
+            response = StreamingJSONResponse(response)
+        elif not isinstance(response, HttpResponseBase):
             response = Http200(response)
         return response
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        if not timing.is_enabled():
+            return self._dispatch(request, *args, **kwargs)
+
+        with timing.Timings() as timings:
+            response = self._dispatch(request, *args, **kwargs)
+        timing.report(self, request, response, timings)
+        return response
+
+    def get_coalescing_key(self, request):
+        """
+        Return the key identifying requests that can share the response
+        (see :py:mod:`restless.coalescing`), or None if the request
+        shouldn't be coalesced.
+        """
+
+        return coalescing.request_key(self, request)
+
+    def _shared_dispatch(self, request, *args, **kwargs):
+        def handle():
+            return self._make_response(super(Endpoint, self).dispatch(
+                request, *args, **kwargs))
+
+        def build():
+            if self.response_cache is None:
+                return handle()
+            return self.response_cache.get_response(self, request, handle)
+
+        key = None
+        if self.coalesce_requests:
+            key = self.get_coalescing_key(request)
+        if key is None:
+            return build()
+        return coalescing.run(key, build)
+
+    def _dispatch(self, request, *args, **kwargs):
+        self._prepare_request(request)
+
+        route = routing.route(self, request)
+        with route:
+            try:
+                with timing.phase('auth'):
+                    authentication_required = \
+                        self._process_authenticate(request)
+                if authentication_required:
+                    return authentication_required
+
+                with timing.phase('handler'):
+                    if request.method == 'GET' and (self.coalesce_requests or
+                            self.response_cache is not None):
+                        response = self._shared_dispatch(request, *args,
+                            **kwargs)
+                    else:
+                        response = super(Endpoint, self).dispatch(request,
+                            *args, **kwargs)
+            except HttpError as err:
+                response = err.response
+            except Exception as ex:
+                if settings.DEBUG:
+                    response = Http500(str(ex),
+                        traceback=traceback.format_exc())
+                else:
+                    raise
+
+        return route.pin(self._make_response(response))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks for Django Restless.
+
+Run all the benchmarks with::
+
+    python benchmarks.py
+
+or just some of them by passing their names as arguments::
+
+    python benchmarks.py serialize
+"""
+
+from __future__ import print_function
+
+import datetime
+import os
+import sys
+import timeit
+import uuid
+
+from decimal import Decimal
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testproject.settings")
+
+import django  # noqa
+if hasattr(django, 'setup'):
+    django.setup()
+
+from django.test.client import RequestFactory  # noqa
+from restless.http import JSON_ENCODERS, get_json_encoder  # noqa
+from restless.models import serialize  # noqa
+from testapp.models import Book  # noqa
+from testapp.views import SleepView  # noqa
+
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django 4.0+
+    from django.utils.encoding import force_str as force_text
+
+
+def _baseline_serialize_model(obj, fields):
+    # Copy of the original serialize_model() (before the compiled plans),
+    # limited to plain attribute names: the field map is rebuilt and each
+    # value goes through force_text for every object
+    fieldmap = {}
+    for f in obj._meta.concrete_model._meta.local_fields:
+        fieldmap[f.name] = f.attname
+
+    def getfield(f):
+        return getattr(obj, fieldmap.get(f, f))
+
+    data = {}
+    for f in list(fields):
+        data[f] = force_text(getfield(f), strings_only=True)
+    return data
+
+
+def _best(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def _report(name, rows, seconds):
+    print('  %-28s %8.2f us/row' % (name, seconds * 1e6 / rows))
+
+
+def _make_books(rows):
+    return [Book(id=i, author_id=1, publisher_id=1, title='Book %d' % i,
+        isbn='123-1-12-123456-%d' % i, price=Decimal('10.00'))
+        for i in range(rows)]
+
+
+def bench_serialize(rows=10000):
+    """Per-row serialization cost: compiled plans vs. the original
+    per-object setup."""
+
+    books = _make_books(rows)
+    fields = ['id', 'title', 'isbn', 'price', 'author']
+
+    per_object = _best(lambda: [_baseline_serialize_model(b, fields)
+        for b in books])
+    compiled = _best(lambda: serialize(books, fields=fields))
+
+    print('serialize (%d rows)' % rows)
+    _report('per-object setup', rows, per_object)
+    _report('compiled plan', rows, compiled)
+    print('  speedup: %.1fx' % (per_object / compiled))
+
+
+def bench_encode(rows=5000):
+    """JSON encoding cost of a typical list response, per backend."""
+
+    now = datetime.datetime(2015, 1, 2, 3, 4, 5, 678901)
+    payload = [{
+        'id': i,
+        'uid': uuid.uuid4(),
+        'title': u'Book %d \u2013 a story' % i,
+        'price': Decimal('10.%02d' % (i % 100)),
+        'created_at': now,
+        'published': now.date(),
+        'in_stock': i % 2 == 0,
+        'tags': ['fiction', 'novel'],
+        'author': {'id': i % 10, 'name': 'Author %d' % (i % 10)},
+    } for i in range(rows)]
+
+    print('encode (%d rows)' % rows)
+    for name in sorted(JSON_ENCODERS):
+        encoder = get_json_encoder(name)
+        if name != 'json' and encoder is get_json_encoder('json'):
+            print('  %-28s not installed' % name)
+            continue
+        _report(name, rows, _best(lambda: encoder(payload)))
+
+
+def bench_concurrency(requests=200, delay=0.01, workers=10):
+    """Throughput of I/O-bound handlers: sync worker threads vs. async."""
+
+    try:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from testapp.asyncviews import AsyncSleepView
+    except (ImportError, SyntaxError):
+        print('concurrency: async views require Django 4.1+')
+        return
+
+    factory = RequestFactory()
+    sync_view = SleepView.as_view()
+    async_view = AsyncSleepView.as_view()
+
+    def make_requests():
+        return [factory.get('/', {'delay': delay}) for i in range(requests)]
+
+    def run_sync():
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(sync_view, make_requests()))
+
+    def run_async():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(asyncio.gather(
+                *[async_view(r) for r in make_requests()]))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    print('concurrency (%d requests, %d ms I/O each, %d sync workers)' % (
+        requests, delay * 1000, workers))
+    for name, fn in [('sync', run_sync), ('async', run_async)]:
+        print('  %-28s %8.0f req/s' % (name, requests / _best(fn, repeat=3)))
+
+
+BENCHMARKS = [
+    ('serialize', bench_serialize),
+    ('encode', bench_encode),
+    ('concurrency', bench_concurrency),
+]
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:]
+    for name, fn in BENCHMARKS:
+        if not selected or name in selected:
+            fn()
@@ -0,0 +1,80 @@
+import asyncio
+
+from restless.asyncviews import (AsyncEndpoint, AsyncListEndpoint,
+    AsyncDetailEndpoint, AsyncActionEndpoint)
+from restless.auth import BasicHttpAuthMixin, login_required
+from restless.cache import ResponseCache
+from restless.http import Http403, Http404, HttpError
+
+from .models import *
+
+__all__ = ['AsyncEchoView', 'AsyncErrorRaisingView', 'AsyncBasicAuth',
+    'AsyncCustomAuthMethod', 'AsyncPublisherList', 'AsyncPublisherDetail',
+    'AsyncPublisherAction', 'AsyncSleepView', 'AsyncCachedPublisherList',
+    'AsyncCoalescedView']
+
+
+class AsyncEchoView(AsyncEndpoint):
+    async def post(self, request):
+        return {'data': request.data, 'params': request.params}
+
+    async def get(self, request):
+        return await self.post(request)
+
+
+class AsyncErrorRaisingView(AsyncEndpoint):
+    async def get(self, request):
+        raise HttpError(400, 'raised error', extra_data='foo')
+
+
+class AsyncBasicAuth(AsyncEndpoint, BasicHttpAuthMixin):
+    @login_required
+    async def get(self, request):
+        return {'user': request.user.username}
+
+
+class AsyncCustomAuthMethod(AsyncEndpoint):
+    async def authenticate(self, request):
+        if request.params.get('user') != 'friend':
+            return Http403('forbidden')
+
+    async def get(self, request):
+        return 'OK'
+
+
+class AsyncPublisherList(AsyncListEndpoint):
+    model = Publisher
+
+
+class AsyncCachedPublisherList(AsyncListEndpoint):
+    model = Publisher
+    response_cache = ResponseCache(timeout=60, depends_on=[Publisher])
+
+
+class AsyncPublisherDetail(AsyncDetailEndpoint):
+    model = Publisher
+
+
+class AsyncPublisherAction(AsyncActionEndpoint):
+    model = Publisher
+
+    async def action(self, request, obj, *args, **kwargs):
+        return {'result': 'done', 'name': obj.name}
+
+
+class AsyncSleepView(AsyncEndpoint):
+    async def get(self, request):
+        await asyncio.sleep(float(request.params.get('delay', 0)))
+        return {'slept': True}
+
+
+class AsyncCoalescedView(AsyncEndpoint):
+    coalesce_requests = True
+    calls = 0
+
+    async def get(self, request):
+        type(self).calls += 1
+        await asyncio.sleep(float(request.params.get('delay', 0)))
+        if 'missing' in request.params:
+            return Http404({'calls': type(self).calls})
+        return {'calls': type(self).calls}
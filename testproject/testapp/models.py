@@ -1,6 +1,6 @@
 from django.db import models
 
-__all__ = ['Author', 'Book', 'Publisher']
+__all__ = ['Author', 'Book', 'Publisher', 'Article']
 
 
 class Publisher(models.Model):
@@ -12,8 +12,16 @@ class Author(models.Model):
 
 
 class Book(models.Model):
-    author = models.ForeignKey(Author, related_name='books')
-    publisher = models.ForeignKey(Publisher, related_name='publisher')
+    author = models.ForeignKey(Author, related_name='books',
+        on_delete=models.CASCADE)
+    publisher = models.ForeignKey(Publisher, related_name='publisher',
+        on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     isbn = models.CharField(max_length=64, unique=True)
     price = models.DecimalField(max_digits=20, decimal_places=2)
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=255)
+    version = models.PositiveIntegerField(default=1)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
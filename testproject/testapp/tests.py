@@ -1,21 +1,69 @@
+from django import VERSION as DJANGO_VERSION
 from django.test import TestCase
-from django.test.client import Client, MULTIPART_CONTENT
-from django.core.urlresolvers import reverse
-from django.contrib.auth.models import User
+from django.test.client import Client, RequestFactory, MULTIPART_CONTENT
+from django.core.files.uploadedfile import SimpleUploadedFile
+try:
+    from django.urls import reverse
+except ImportError:
+    from django.core.urlresolvers import reverse
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Count
+from django.utils.functional import lazy
+from django.utils.http import http_date
+from django.test.utils import CaptureQueriesContext
 import json
+import datetime
+import calendar
+import threading
+import time
+import uuid
+import unittest
 from decimal import Decimal
 import base64
 import warnings
 import six
 
 from .models import *
-from restless.models import serialize, flatten
+from .views import (EchoView, UploadView, ErrorRaisingView,
+    TestSignedTokenAuth, CachedBookDetail, CachedPublisherList,
+    CoalescedView, ArticleList, ReplicaArticleList)
+from restless.models import (serialize, iter_serialize, flatten,
+    FragmentCache)
+from restless.cache import ResponseCache, objects_changed
+from restless.http import (StreamingJSONResponse, JSONResponse, RawJSON,
+    Http200, Http404, get_json_encoder)
+from restless.auth import create_signed_token
+from restless.authtoken.models import Token, hash_key
+from restless.views import Endpoint
+from restless.modelviews import ListEndpoint, DetailEndpoint
+from restless import routing, timing
 
 try:
     from urllib.parse import urlencode
 except ImportError:
     from urllib import urlencode
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def compact_encoder(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+collected_timings = []
+
+
+def collect_timings(endpoint, request, durations):
+    collected_timings.append((type(endpoint).__name__, durations))
+
 
 class TestClient(Client):
 
@@ -284,6 +332,187 @@ class TestSerialization(TestCase):
 
         self.assertEqual(runs[0], 2)
 
+    def test_serialization_plan_is_cached(self):
+        """Test that the compiled serialization plan is reused"""
+
+        from restless.models import _Spec
+
+        fields = ['id', 'title', ('author', dict(fields=['name']))]
+        spec = _Spec(fields=fields)
+        other_spec = _Spec(fields=list(fields))
+        self.assertTrue(spec.plan_for(Book) is other_spec.plan_for(Book))
+        self.assertEqual(serialize(self.books[0], fields=fields), {
+            'id': self.books[0].id,
+            'title': 'Book 0',
+            'author': {'name': 'User Foo'},
+        })
+
+    def test_serialize_unhashable_spec(self):
+        """Test that specs which can't be cached are still serialized"""
+
+        s = serialize(self.author, fields=['name'], exclude=[['x']])
+        self.assertEqual(s, {'name': 'User Foo'})
+
+    def test_serialize_queryset_prefetches_reverse_relations(self):
+        """Test that nested reverse relations are prefetched"""
+
+        another = Author.objects.create(name='User Bar')
+        another.books.create(title='Another Book', isbn='321',
+            price=Decimal('1.0'), publisher=self.publisher)
+
+        with self.assertNumQueries(2):
+            s = serialize(Author.objects.all(), include=[
+                ('books', dict(include=[('publisher', dict())]))
+            ])
+
+        self.assertEqual(len(s), 2)
+        self.assertEqual(len(s[0]['books']), len(self.books))
+        self.assertEqual(s[1]['books'][0]['publisher']['name'], 'Publisher')
+
+    def test_serialize_queryset_selects_forward_relations(self):
+        """Test that nested foreign keys are fetched in the same query"""
+
+        with self.assertNumQueries(1):
+            s = serialize(Book.objects.all(), fields=[
+                'title',
+                ('author', dict(fields=['name'])),
+                ('publisher', dict()),
+            ])
+
+        self.assertEqual(len(s), len(self.books))
+        self.assertEqual(s[0]['author'], {'name': 'User Foo'})
+        self.assertEqual(s[0]['publisher']['name'], 'Publisher')
+
+    def test_serialize_queryset_keeps_explicit_prefetch(self):
+        """Test that explicitly prefetched relations are left alone"""
+
+        qs = Author.objects.prefetch_related('books__author')
+        with self.assertNumQueries(2):
+            s = serialize(qs, include=[('books', dict(fields=['title']))])
+        self.assertEqual(len(s[0]['books']), len(self.books))
+
+    def test_serialize_queryset_reads_values(self):
+        """Test that plain field lists are read without model instances"""
+
+        qs = Book.objects.filter(pk=self.books[0].pk)
+        expected = serialize(list(qs.all()), fields=['title', 'price',
+            'author'])
+        with CaptureQueriesContext(connection) as ctx:
+            s = serialize(qs, fields=['title', 'price', 'author'])
+
+        self.assertEqual(s, expected)
+        self.assertEqual(s[0], {'title': 'Book 0', 'price': Decimal('10.0'),
+            'author': self.author.id})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertFalse('isbn' in ctx.captured_queries[0]['sql'])
+
+    def test_serialize_queryset_loads_only_needed_fields(self):
+        """Test that only the serialized columns are loaded"""
+
+        with CaptureQueriesContext(connection) as ctx:
+            s = serialize(Book.objects.all(), fields=['title',
+                ('author', dict(fields=['name']))])
+
+        self.assertEqual(s[0], {'title': 'Book 0',
+            'author': {'name': 'User Foo'}})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertFalse('isbn' in ctx.captured_queries[0]['sql'])
+
+    def test_serialize_queryset_with_accessor_loads_instances(self):
+        """Test that accessor functions get fully loaded instances"""
+
+        with CaptureQueriesContext(connection) as ctx:
+            s = serialize(Book.objects.all(), fields=['title',
+                ('code', lambda b: b.isbn)])
+
+        self.assertEqual(s[0]['code'], self.books[0].isbn)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_iter_serialize_queryset(self):
+        """Test that iter_serialize yields the same data as serialize"""
+
+        for chunk_size in (1, 3, 100):
+            s = iter_serialize(Book.objects.all(), fields=['title',
+                ('author', dict(fields=['name']))], chunk_size=chunk_size)
+            self.assertFalse(isinstance(s, list))
+            self.assertEqual(list(s), serialize(Book.objects.all(),
+                fields=['title', ('author', dict(fields=['name']))]))
+
+    def test_iter_serialize_prefetches_per_chunk(self):
+        """Test that related objects are prefetched for each chunk"""
+
+        for i in range(3):
+            Author.objects.create(name='Author %d' % i)
+
+        with self.assertNumQueries(3):
+            s = list(iter_serialize(Author.objects.all(), include=[
+                ('books', dict(fields=['title']))
+            ], chunk_size=2))
+
+        self.assertEqual(len(s), 4)
+        self.assertEqual(len(s[0]['books']), len(self.books))
+
+    def test_iter_serialize_values(self):
+        """Test that iter_serialize reads plain fields as values"""
+
+        s = list(iter_serialize(Author.objects.all()))
+        self.assertEqual(s, [{'id': self.author.id, 'name': 'User Foo'}])
+
+    def test_field_converters_match_force_text(self):
+        """Test that field converters give the same result as force_text"""
+
+        from django.db import models
+        from django.db.models.fields.files import FieldFile
+        from restless.models import _field_converters, force_text
+
+        now = datetime.datetime(2015, 1, 2, 3, 4, 5, 678901)
+        samples = [
+            (models.AutoField(primary_key=True), [1, None]),
+            (models.IntegerField(), [-1, 0, None]),
+            (models.BooleanField(), [True, False]),
+            (models.FloatField(), [1.5]),
+            (models.DecimalField(), [Decimal('10.20')]),
+            (models.DateTimeField(), [now, None]),
+            (models.DateField(), [now.date()]),
+            (models.CharField(), [u'\u0160ibenik', '', None]),
+            (models.TextField(), [u'text']),
+            (models.UUIDField(), [uuid.uuid4(), None]),
+        ]
+        for field, values in samples:
+            convert, convert_value = _field_converters(field)
+            for value in values:
+                expected = force_text(value, strings_only=True)
+                for conv in (convert, convert_value):
+                    result = value if conv is None else conv(value)
+                    self.assertEqual(result, expected)
+                    self.assertEqual(type(result), type(expected))
+
+        field = models.FileField()
+        convert, convert_value = _field_converters(field)
+        for name in ('books/cover.png', ''):
+            expected = force_text(FieldFile(None, field, name),
+                strings_only=True)
+            self.assertEqual(convert(FieldFile(None, field, name)), expected)
+            self.assertEqual(convert_value(name), expected)
+
+        self.assertEqual(_field_converters(models.DurationField()), None)
+
+    def test_serialize_foreign_key_converter(self):
+        """Test that foreign keys are serialized as the raw key value"""
+
+        s = serialize(Book.objects.all(), fields=['author', 'publisher'])
+        self.assertEqual(s[0], {'author': self.author.id,
+            'publisher': self.publisher.id})
+
+    def test_serialize_mixed_list(self):
+        """Test serializing a list of objects of different models"""
+
+        s = serialize([self.author, self.publisher])
+        self.assertEqual(s, [
+            {'id': self.author.id, 'name': 'User Foo'},
+            {'id': self.publisher.id, 'name': 'Publisher'},
+        ])
+
 
 class TestEndpoint(TestCase):
 
@@ -402,11 +631,326 @@ class TestEndpoint(TestCase):
         # invalid JSON and will return 400 instead of 200.
         self.assertEqual(r.status_code, 200)
 
+    def test_streaming_response(self):
+        """Exercise streaming the generator returned from the view"""
+
+        Author.objects.create(name='User Bar')
+        Author.objects.create(name='User Baz')
+        r = self.client.get('author_stream')
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        data = json.loads(b''.join(r.streaming_content).decode('utf-8'))
+        self.assertEqual([a['name'] for a in data],
+            ['User Foo', 'User Bar', 'User Baz'])
+
+    def test_streaming_json_response_buffering(self):
+        """Test that StreamingJSONResponse output is a valid JSON array"""
+
+        items = [{'n': i, 'price': Decimal('1.5')} for i in range(100)]
+        for buffer_size in (1, 50, 100000):
+            r = StreamingJSONResponse(iter(items))
+            r.buffer_size = buffer_size
+            content = b''.join(r.streaming_content).decode('utf-8')
+            self.assertEqual(json.loads(content), json.loads(
+                json.dumps(items, default=str)))
+
+        r = StreamingJSONResponse(iter([]))
+        self.assertEqual(b''.join(r.streaming_content), b'[]')
+
+    def test_request_body_is_read_lazily(self):
+        """Test that the body isn't read if the view doesn't need it"""
+
+        request = RequestFactory().post('/', data='{"a": 1}',
+            content_type='application/json')
+        r = ErrorRaisingView.as_view()(request)
+        self.assertEqual(r.status_code, 405)
+        self.assertFalse(request._read_started)
+
+        request = RequestFactory().post('/', data='{"a": 1}',
+            content_type='application/json')
+        r = EchoView.as_view()(request)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(request._read_started)
+        self.assertEqual(request.data, {'a': 1})
+        self.assertTrue(request.data is request.data)
+
+    def test_request_attributes_can_be_set(self):
+        request = RequestFactory().get('/', data={'a': 'b'})
+        EchoView.as_view()(request)
+        self.assertEqual(request.params, {'a': 'b'})
+        self.assertEqual(request.data, None)
+        request.data = {'c': 'd'}
+        self.assertEqual(request.data, {'c': 'd'})
+
+    def test_multipart_upload_is_streamed(self):
+        """Test that uploads are handled by Django's upload handlers"""
+
+        request = RequestFactory().post('/', data={
+            'name': 'value',
+            'upload': SimpleUploadedFile('test.txt', b'contents'),
+        })
+        r = UploadView.as_view()(request)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content.decode('utf-8')), {
+            'data': {'name': 'value'},
+            'files': ['upload'],
+            'raw_data': None,
+        })
+
     def test_raising_http_error_returns_it(self):
         r = self.client.get('error_raising_view')
         self.assertEqual(r.status_code, 400)
 
 
+class TestJSONEncoding(TestCase):
+
+    payload = {
+        'price': Decimal('10.20'),
+        'created': datetime.datetime(2015, 1, 2, 3, 4, 5, 678901),
+        'day': datetime.date(2015, 1, 2),
+        'uid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'label': lazy(lambda: 'lazy', six.text_type)(),
+        'name': u'\u0160ibenik',
+        'items': [1, 2.5, None, True, (3, 4)],
+    }
+
+    def test_default_encoder_is_stdlib(self):
+        r = JSONResponse(self.payload)
+        self.assertEqual(r.content, json.dumps(self.payload,
+            cls=DjangoJSONEncoder).encode('utf-8'))
+
+    @unittest.skipIf(orjson is None, 'orjson not installed')
+    def test_orjson_encoder_output_matches(self):
+        """Test that orjson encodes to the same data as the stdlib encoder"""
+
+        expected = json.loads(get_json_encoder('json')(self.payload))
+        with self.settings(RESTLESS_JSON_ENCODER='orjson'):
+            r = JSONResponse(self.payload)
+        self.assertEqual(json.loads(r.content.decode('utf-8')), expected)
+        self.assertEqual(expected['created'], '2015-01-02T03:04:05.678')
+
+    @unittest.skipIf(orjson is None, 'orjson not installed')
+    def test_orjson_encoder_falls_back(self):
+        """Test that values orjson doesn't support are still encoded"""
+
+        data = {'big': 2 ** 70, 1: 'one'}
+        self.assertEqual(json.loads(get_json_encoder('orjson')(data)),
+            {'big': 2 ** 70, '1': 'one'})
+
+    def test_custom_encoder(self):
+        """Test using an encoder function specified by dotted path"""
+
+        with self.settings(
+                RESTLESS_JSON_ENCODER='testapp.tests.compact_encoder'):
+            r = JSONResponse({'a': [1, 2]})
+        self.assertEqual(r.content, b'{"a":[1,2]}')
+
+    def test_encoder_class_attribute(self):
+        class CompactResponse(JSONResponse):
+            json_encoder = 'testapp.tests.compact_encoder'
+
+        self.assertEqual(CompactResponse([1, 2]).content, b'[1,2]')
+
+    def test_unknown_encoder(self):
+        self.assertRaises(ImproperlyConfigured, get_json_encoder, 'nope')
+
+
+class TestTiming(TestCase):
+
+    def setUp(self):
+        self.client = TestClient()
+        author = Author.objects.create(name='User Foo')
+        author.books.create(title='Book', isbn='1234', price=Decimal('10.0'),
+            publisher=Publisher.objects.create(name='Publisher'))
+        timing.registry.clear()
+
+    def test_timing_disabled_by_default(self):
+        r = self.client.get('author_books_list')
+        self.assertFalse(r.has_header('Server-Timing'))
+        self.assertEqual(timing.registry.snapshot(), {})
+
+    def test_server_timing_header(self):
+        """Test that phase timings are reported in Server-Timing header"""
+
+        with self.settings(RESTLESS_TIMING=True, RESTLESS_TIMING_HEADER=True):
+            r = self.client.get('author_books_list')
+        self.assertEqual(r.status_code, 200)
+        phases = [item.split(';')[0]
+            for item in r['Server-Timing'].split(', ')]
+        self.assertEqual(phases,
+            ['auth', 'handler', 'serialize', 'encode', 'total'])
+
+    def test_parse_phase(self):
+        class DataView(Endpoint):
+            def post(self, request):
+                return request.data
+
+        request = RequestFactory().post('/', data=json.dumps({'a': 1}),
+            content_type='application/json')
+        with self.settings(RESTLESS_TIMING=True, RESTLESS_TIMING_HEADER=True):
+            r = DataView.as_view()(request)
+        self.assertIn('parse;dur=', r['Server-Timing'])
+
+    def test_registry(self):
+        """Test that timings are recorded in the histogram registry"""
+
+        with self.settings(RESTLESS_TIMING=True):
+            self.client.get('author_books_list')
+            r = self.client.get('author_books_list')
+        self.assertFalse(r.has_header('Server-Timing'))
+
+        snapshot = timing.registry.snapshot()
+        hist = snapshot[('testapp.views.AuthorBooksList', 'serialize')]
+        self.assertEqual(hist['count'], 2)
+        self.assertEqual(hist['buckets'][-1], (float('inf'), 2))
+        self.assertIn(('testapp.views.AuthorBooksList', 'total'), snapshot)
+
+    def test_custom_hook(self):
+        del collected_timings[:]
+        with self.settings(RESTLESS_TIMING=True,
+                RESTLESS_TIMING_HOOK='testapp.tests.collect_timings'):
+            self.client.get('author_books_list')
+        self.assertEqual(len(collected_timings), 1)
+        name, durations = collected_timings[0]
+        self.assertEqual(name, 'AuthorBooksList')
+        self.assertEqual(timing.registry.snapshot(), {})
+
+    def test_nested_phases_are_exclusive(self):
+        """Test that time in nested phases isn't counted in the outer one"""
+
+        with timing.Timings() as timings:
+            with timing.phase('handler'):
+                with timing.phase('serialize'):
+                    pass
+                with timing.phase('serialize'):
+                    pass
+        self.assertIsNone(timing.current())
+        self.assertEqual(sorted(timings.durations),
+            ['handler', 'serialize', 'total'])
+        self.assertLessEqual(timings.durations['handler'] +
+            timings.durations['serialize'], timings.durations['total'])
+
+    def test_histogram(self):
+        hist = timing.Histogram(buckets=[0.1, 0.01])
+        for value in [0.005, 0.01, 0.05, 1]:
+            hist.observe(value)
+        snapshot = hist.snapshot()
+        self.assertEqual(snapshot['buckets'],
+            [(0.01, 2), (0.1, 3), (float('inf'), 4)])
+        self.assertEqual(snapshot['count'], 4)
+
+
+class TestFragmentCache(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name='User Foo')
+        self.publisher = Publisher.objects.create(name='Publisher')
+        for i in range(3):
+            self.author.books.create(title='Book %d' % i, isbn='%d' % i,
+                price=Decimal('10.0'), publisher=self.publisher)
+        self.fields = ['id', 'title', ('author', dict(fields=['name']))]
+
+    def decode(self, raw):
+        return json.loads(JSONResponse(raw).content.decode('utf-8'))
+
+    def expected(self):
+        return json.loads(JSONResponse(serialize(Book.objects.all(),
+            fields=self.fields)).content.decode('utf-8'))
+
+    def test_list_is_assembled_from_fragments(self):
+        fragments = FragmentCache(Book, fields=self.fields)
+        self.assertEqual(self.decode(fragments.serialize(
+            Book.objects.all())), self.expected())
+
+        # Only the primary keys are read when everything is cached
+        with self.assertNumQueries(1):
+            raw = fragments.serialize(Book.objects.all())
+        self.assertEqual(self.decode(raw), self.expected())
+
+    def test_single_instance(self):
+        fragments = FragmentCache(Book, fields=self.fields)
+        book = Book.objects.first()
+        self.assertEqual(self.decode(fragments.serialize(book)),
+            serialize(book, fields=self.fields))
+        with self.assertNumQueries(0):
+            fragments.serialize(book)
+
+    def test_invalidated_on_save_and_delete(self):
+        fragments = FragmentCache(Book, fields=self.fields)
+        fragments.serialize(Book.objects.all())
+
+        book = Book.objects.first()
+        book.title = 'Changed'
+        book.save()
+        Book.objects.last().delete()
+
+        data = self.decode(fragments.serialize(Book.objects.all()))
+        self.assertEqual(data, self.expected())
+        self.assertEqual(data[0]['title'], 'Changed')
+        self.assertEqual(len(data), 2)
+
+    def test_version_field(self):
+        fragments = FragmentCache(Book, fields=self.fields,
+            version_field='title')
+        fragments.serialize(list(Book.objects.all()))
+
+        # update() doesn't send signals, but changes the version
+        Book.objects.filter(title='Book 0').update(title='Changed')
+        data = self.decode(fragments.serialize(Book.objects.all()))
+        self.assertEqual(data, self.expected())
+        self.assertEqual(data[0]['title'], 'Changed')
+
+    def test_invalidated_on_objects_changed(self):
+        fragments = FragmentCache(Book, fields=self.fields)
+        fragments.serialize(Book.objects.all())
+
+        book = Book.objects.first()
+        Book.objects.filter(pk=book.pk).update(title='Changed')
+        objects_changed.send(sender=Book, pks=[book.pk], using='default')
+        data = self.decode(fragments.serialize(Book.objects.all()))
+        self.assertEqual(data, self.expected())
+        self.assertEqual(data[0]['title'], 'Changed')
+
+    def test_queryset_customizations_are_kept(self):
+        Author.objects.create(name='User Bar')
+        fields = ['id', 'name', 'num_books']
+        fragments = FragmentCache(Author, fields=fields)
+        qs = Author.objects.annotate(num_books=Count('books')).order_by('id')
+        expected = serialize(qs.all(), fields=fields)
+        self.assertEqual([a['num_books'] for a in expected], [3, 0])
+
+        self.assertEqual(self.decode(fragments.serialize(qs[1:])),
+            expected[1:])
+        self.assertEqual(self.decode(fragments.serialize(qs.all())),
+            expected)
+
+    def test_django_cache_backend(self):
+        self.assertRaises(ImproperlyConfigured, FragmentCache, Book,
+            backend='default')
+
+        fragments = FragmentCache(Book, fields=self.fields,
+            name='test-books', backend='default')
+        self.assertEqual(self.decode(fragments.serialize(
+            Book.objects.all())), self.expected())
+        other = FragmentCache(Book, fields=self.fields,
+            name='test-books', backend='default')
+        with self.assertNumQueries(1):
+            raw = other.serialize(Book.objects.all())
+        self.assertEqual(self.decode(raw), self.expected())
+        fragments.cache.clear()
+
+    def test_raw_json_nested(self):
+        """Test that RawJSON is included as is anywhere in the data"""
+
+        data = {'results': RawJSON(b'[{"a": 1}]'), 'other': [RawJSON(b'2')],
+            'price': Decimal('1.5')}
+        for name in ('json', 'orjson'):
+            encoded = get_json_encoder(name)(data)
+            self.assertEqual(json.loads(encoded.decode('utf-8')),
+                {'results': [{'a': 1}], 'other': [2], 'price': '1.5'})
+        self.assertEqual(JSONResponse(RawJSON(b'[]')).content, b'[]')
+
+
 class TestAuth(TestCase):
 
     def setUp(self):
@@ -429,6 +973,44 @@ class TestAuth(TestCase):
         })
         self.assertEqual(r.status_code, 403)
 
+    def test_login_skipped_for_logged_in_session(self):
+        """Test that repeated logins don't re-authenticate the session"""
+
+        from django.contrib import auth
+
+        credentials = {'username': 'foo', 'password': 'bar'}
+        r = self.client.get('login_view', data=credentials)
+        self.assertEqual(r.status_code, 200)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+        calls = []
+        authenticate = auth.authenticate
+
+        def counting_authenticate(**credentials):
+            calls.append(credentials['username'])
+            return authenticate(**credentials)
+
+        auth.authenticate = counting_authenticate
+        try:
+            r = self.client.get('login_view', data=credentials)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json['id'], self.user.id)
+            r = self.client.get('login_view')
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(calls, [])
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, r.cookies)
+            self.assertEqual(session_key,
+                self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+            User.objects.create_user(username='other', password='pwd')
+            r = self.client.get('login_view', data={
+                'username': 'other', 'password': 'pwd',
+            })
+            self.assertEqual(calls, ['other'])
+            self.assertEqual(r.json['username'], 'other')
+        finally:
+            auth.authenticate = authenticate
+
     def test_basic_auth_challenge(self):
         """Test that HTTP Basic Auth challenge is issued"""
         r = self.client.get('basic_auth_view')
@@ -452,6 +1034,174 @@ class TestAuth(TestCase):
         })
         self.assertEqual(r.status_code, 401)
 
+    def _cached_basic_auth(self, password='bar'):
+        return self.client.get('cached_basic_auth_view', extra={
+            'HTTP_AUTHORIZATION': 'Basic ' +
+                base64.b64encode(b'foo:' + password.encode('ascii')).decode(
+                    'ascii'),
+        })
+
+    def test_basic_auth_credentials_cache(self):
+        """Test that verified Basic Auth credentials are cached"""
+
+        from django.contrib import auth
+        from restless.auth import credentials_cache
+
+        credentials_cache.clear()
+        calls = []
+        authenticate = auth.authenticate
+
+        def counting_authenticate(**credentials):
+            calls.append(credentials['username'])
+            return authenticate(**credentials)
+
+        auth.authenticate = counting_authenticate
+        try:
+            self.assertEqual(self._cached_basic_auth().status_code, 200)
+            r = self._cached_basic_auth()
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json['id'], self.user.id)
+            self.assertEqual(calls, ['foo'])
+
+            self.assertEqual(self._cached_basic_auth('baz').status_code, 401)
+            self.assertEqual(calls, ['foo', 'foo'])
+        finally:
+            auth.authenticate = authenticate
+
+        for key, (value, expires) in credentials_cache._data.items():
+            self.assertNotIn('bar', key)
+            self.assertEqual(value[0], self.user.id)
+            self.assertNotIn(self.user.password, value[1])
+
+    def test_basic_auth_credentials_cache_invalidation(self):
+        """Test that cached credentials are checked against the user"""
+
+        from restless.auth import credentials_cache
+
+        credentials_cache.clear()
+        self.assertEqual(self._cached_basic_auth().status_code, 200)
+
+        self.user.set_password('baz')
+        self.user.save()
+        self.assertEqual(self._cached_basic_auth().status_code, 401)
+        self.assertEqual(self._cached_basic_auth('baz').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._cached_basic_auth('baz').status_code, 401)
+
+    def _token_auth(self, key):
+        return self.client.get('token_auth_view', extra={
+            'HTTP_AUTHORIZATION': 'Bearer ' + key,
+        })
+
+    def test_token_auth_challenge(self):
+        """Test that token auth challenge is issued"""
+
+        r = self.client.get('token_auth_view')
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(r['WWW-Authenticate'], 'Bearer realm="api"')
+        self.assertEqual(self._token_auth('nonexistent').status_code, 401)
+
+    def test_token_auth_succeeds(self):
+        """Test token auth, with the token users cached"""
+
+        token, key = Token.objects.create_token(self.user)
+        self.assertNotIn(key, token.key_hash)
+        self.assertEqual(token.key_hash, hash_key(key))
+
+        r = self._token_auth(key)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'id': self.user.id, 'username': 'foo'})
+
+        with self.assertNumQueries(0):
+            r = self._token_auth(key)
+        self.assertEqual(r.json, {'id': self.user.id, 'username': 'foo'})
+
+    def test_token_auth_expired_token(self):
+        expires = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        token, key = Token.objects.create_token(self.user, expires=expires)
+        self.assertTrue(token.is_expired())
+        self.assertEqual(self._token_auth(key).status_code, 401)
+
+    def test_token_auth_cache_invalidation(self):
+        """Test that cached tokens are invalidated on changes"""
+
+        token, key = Token.objects.create_token(self.user)
+        self.assertEqual(self._token_auth(key).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._token_auth(key).status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self._token_auth(key).status_code, 200)
+
+        token.delete()
+        self.assertEqual(self._token_auth(key).status_code, 401)
+
+    def test_token_auth_shared_cache(self):
+        """Test that token users can be cached in a Django cache"""
+
+        token, key = Token.objects.create_token(self.user)
+        cache_key = 'restless:token:' + token.key_hash
+        with self.settings(RESTLESS_TOKEN_CACHE='default'):
+            self.assertEqual(self._token_auth(key).status_code, 200)
+            self.assertIsNotNone(caches['default'].get(cache_key))
+            with self.assertNumQueries(0):
+                self.assertEqual(self._token_auth(key).status_code, 200)
+
+            token.delete()
+            self.assertIsNone(caches['default'].get(cache_key))
+            self.assertEqual(self._token_auth(key).status_code, 401)
+
+    def _signed_token_auth(self, token, **params):
+        return self.client.get('signed_token_auth_view', data=params,
+            extra={'HTTP_AUTHORIZATION': 'Bearer ' + token})
+
+    def test_signed_token_auth(self):
+        """Test issuing and using stateless signed tokens"""
+
+        r = self.client.get('signed_token_login', data={
+            'username': 'foo', 'password': 'bar',
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, r.cookies)
+        token = r.json['token']
+
+        with self.assertNumQueries(0):
+            r = self._signed_token_auth(token)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'id': self.user.id, 'username': 'foo'})
+
+        self.user.email = 'foo@example.com'
+        self.user.save()
+        with self.assertNumQueries(1):
+            r = self._signed_token_auth(token, full='1')
+        self.assertEqual(r.json['email'], 'foo@example.com')
+
+    def test_signed_token_auth_invalid_token(self):
+        r = self.client.get('signed_token_auth_view')
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(r['WWW-Authenticate'], 'Bearer realm="api"')
+
+        token = create_signed_token(self.user)
+        self.assertEqual(self._signed_token_auth(token).status_code, 200)
+        self.assertEqual(self._signed_token_auth(token + 'x').status_code,
+            401)
+        self.assertEqual(self._signed_token_auth(
+            create_signed_token(self.user, salt='other')).status_code, 401)
+
+    def test_signed_token_auth_expired_token(self):
+        class ExpiredTokenView(TestSignedTokenAuth):
+            signed_token_max_age = -1
+
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' +
+            create_signed_token(self.user))
+        request.user = None
+        self.assertEqual(ExpiredTokenView.as_view()(request).status_code, 401)
+
     def test_custom_auth_fn_returning_none_allows_request(self):
         r = self.client.get('custom_auth_method', data={'user': 'friend'})
         self.assertEqual(r.status_code, 200)
@@ -543,9 +1293,1049 @@ class TestModelViews(TestCase):
         self.assertEqual(r.status_code, 200)
         self.assertEqual(r.json, {'result': 'done'})
 
+    def test_list_query_count_is_constant(self):
+        """Excercise prefetching nested relations in ListEndpoint"""
+
+        for i in range(5):
+            author = Author.objects.create(name='Author %d' % i)
+            author.books.create(title='Book %d' % i, isbn='99%d' % i,
+                price=Decimal('1.0'), publisher=self.publisher)
+
+        with self.assertNumQueries(2):
+            r = self.client.get('author_books_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json), 6)
+        self.assertEqual(r.json[0]['books'][0]['publisher']['name'],
+            'User Foo')
+
+    def _create_books(self, prices):
+        for i, price in enumerate(prices):
+            author = Author.objects.create(name='Author %d' % i)
+            author.books.create(title='Book %d' % i, isbn='99%d' % i,
+                price=Decimal(price), publisher=self.publisher)
+
+    def _get_url(self, url):
+        return self.client.process(Client.get(self.client, url))
+
+    def test_cursor_pagination(self):
+        """Excercise paging forward and back with cursor pagination"""
+
+        self._create_books(['5.0', '20.0', '10.0', '10.0', '1.0'])
+        expected = list(Book.objects.order_by('-price', 'pk')
+            .values_list('id', flat=True))
+
+        r = self.client.get('cursor_book_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertIsNone(r.json['previous'])
+        pages = [r.json]
+        while pages[-1]['next']:
+            pages.append(self._get_url(pages[-1]['next']).json)
+        self.assertEqual([len(p['results']) for p in pages], [2, 2, 2])
+        self.assertEqual([b['id'] for p in pages for b in p['results']],
+            expected)
+        self.assertEqual(pages[0]['results'][0]['author']['name'],
+            'Author 1')
+
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = self._get_url(page['previous']).json
+            self.assertEqual(page['results'], expected_page['results'])
+        self.assertIsNone(page['previous'])
+
+    def test_cursor_pagination_query_count(self):
+        """Test that deep pages take the same number of queries"""
+
+        self._create_books(['%d.0' % i for i in range(9)])
+        r = self.client.get('cursor_book_list')
+        while r.json['next']:
+            with self.assertNumQueries(2):
+                r = self._get_url(r.json['next'])
+
+    def test_cursor_pagination_limit(self):
+        self._create_books(['%d.0' % i for i in range(9)])
+
+        r = self.client.get('cursor_book_list', data={'limit': 100})
+        self.assertEqual(len(r.json['results']), 3)
+        r = self.client.get('cursor_book_list', data={'limit': 1})
+        self.assertEqual(len(r.json['results']), 1)
+
+        for params in [{'limit': 'x'}, {'limit': 0}, {'cursor': 'bad'}]:
+            r = self.client.get('cursor_book_list', data=params)
+            self.assertEqual(r.status_code, 400)
+
+    def test_offset_pagination_headers(self):
+        """Excercise offset pagination with links in headers"""
+
+        for i in range(4):
+            Author.objects.create(name='Author %d' % i)
+
+        r = self.client.get('offset_author_list', data={'offset': 2})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([a['name'] for a in r.json],
+            ['Author 1', 'Author 2'])
+        self.assertEqual(r['X-Total-Count'], '5')
+        links = dict((rel.split('"')[1], url.strip(' <>'))
+            for url, rel in (link.split(';')
+                for link in r['Link'].split(',')))
+        self.assertTrue(links['next'].endswith('?offset=4'))
+        self.assertTrue(links['prev'].endswith('?offset=0'))
+
+    def test_filtering(self):
+        """Test that filters and ordering are pushed down to the query"""
+
+        self._create_books(['1.0', '2.0', '3.0'])
+        ids = list(Book.objects.order_by('id').values_list('id', flat=True))
+        author_ids = [Book.objects.get(id=i).author_id for i in ids[1:3]]
+
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get('filtered_book_list', data={
+                'author__in': '%d,%d' % tuple(author_ids),
+                'id__gte': ids[1],
+                'ordering': '-id',
+                'title': 'ignored',
+            })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([b['id'] for b in r.json], ids[2:0:-1])
+
+        sql = queries[0]['sql']
+        where = sql[sql.index(' WHERE '):sql.index(' ORDER BY ')]
+        self.assertIn('"testapp_book"."author_id" IN (%d, %d)' %
+            tuple(author_ids), where)
+        self.assertIn('"testapp_book"."id" >= %d' % ids[1], where)
+        self.assertNotIn('title', where)
+        self.assertTrue(sql.endswith(' ORDER BY "testapp_book"."id" DESC'))
+
+        r = self.client.get('filtered_book_list', data={
+            'id__range': '%d,%d' % (ids[0], ids[1]),
+            'publisher__isnull': 'false',
+        })
+        self.assertEqual([b['id'] for b in r.json], ids[:2])
+
+    def test_filtering_rejects_invalid_params(self):
+        for params in [{'author__icontains': 'x'}, {'author__name': 'x'},
+                {'id': '1'}, {'id__gte': 'x'}, {'id__range': '1'},
+                {'publisher__isnull': 'maybe'}, {'ordering': 'title'}]:
+            r = self.client.get('filtered_book_list', data=params)
+            self.assertEqual(r.status_code, 400)
+
+    def test_filtering_requires_index(self):
+        class View(ListEndpoint):
+            model = Book
+            filter_fields = ['title']
+
+        request = RequestFactory().get('/', {'title': 'Book'})
+        self.assertRaises(ImproperlyConfigured, View.as_view(), request)
+        View.require_indexed_filters = False
+        self.assertEqual(len(json.loads(View.as_view()(request).content)), 1)
+
+    def test_ordering_param_ignored_without_ordering_fields(self):
+        class View(ListEndpoint):
+            model = Book
+            pagination = 'cursor'
+            ordering = ('isbn',)
+
+            def get_query_set(self, request, *args, **kwargs):
+                return Book.objects.filter(
+                    title__startswith=request.params['ordering'])
+
+        self._create_books(['5.0', '20.0'])
+        request = RequestFactory().get('/', {'ordering': 'Book 1'})
+        r = View.as_view()(request)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([b['title'] for b in
+            json.loads(r.content.decode('utf-8'))['results']], ['Book 1'])
+
+    def test_cursor_ordering_must_not_be_nullable(self):
+        class View(ListEndpoint):
+            model = User
+            pagination = 'cursor'
+            ordering_fields = ['last_login']
+            require_indexed_filters = False
+
+        request = RequestFactory().get('/')
+        self.assertRaises(ImproperlyConfigured, View.as_view(), request)
+
+        View.ordering_fields = None
+        View.ordering = ('last_login',)
+        self.assertRaises(ImproperlyConfigured, View.as_view(), request)
+
+    def test_sparse_fieldset(self):
+        """Test that only the requested fields are loaded and returned"""
+
+        self._create_books(['5.0', '20.0', '1.0'])
+
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get('sparse_book_list', data={
+                'fields': 'id,title', 'include': 'author', 'limit': 2})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([sorted(b.keys()) for b in r.json['results']],
+            [['author', 'id', 'title']] * 2)
+        self.assertEqual(r.json['results'][0]['author'], {'name': 'Author 1'})
+
+        # The price is needed for the cursor, the ISBN isn't needed at all
+        columns = queries[0]['sql'].split(' FROM ')[0]
+        self.assertIn('"testapp_book"."price"', columns)
+        self.assertIn('"testapp_author"."name"', columns)
+        self.assertNotIn('isbn', columns)
+
+        r = self._get_url(r.json['next'])
+        self.assertEqual([b['title'] for b in r.json['results']],
+            ['Book 0', 'Book 2'])
+
+        for params in [{'fields': 'id,author_id'}, {'include': 'publisher'}]:
+            r = self.client.get('sparse_book_list', data=params)
+            self.assertEqual(r.status_code, 400)
+
+    def test_sparse_fieldset_detail(self):
+        with self.assertNumQueries(1):
+            r = self.client.get('sparse_book_detail', pk=self.book.pk,
+                data={'fields': 'title', 'include': 'publisher'})
+        self.assertEqual(r.json, {'title': 'Book',
+            'publisher': {'name': 'User Foo'}})
+
+        r = self.client.get('sparse_book_detail', pk=self.book.pk)
+        self.assertEqual(r.json['isbn'], '1234')
+
+    def test_bulk_create(self):
+        """Excercise creating many objects at once via ListEndpoint"""
+
+        names = ['Publisher %d' % i for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.post('bulk_publisher_list', data=json.dumps(
+                [{'name': name} for name in names]),
+                content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual([p['name'] for p in r.json], names)
+        self.assertEqual(sorted(p['id'] for p in r.json), list(
+            Publisher.objects.filter(name__in=names).values_list('id',
+                flat=True).order_by('id')))
+
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        if getattr(connection.features, 'can_return_rows_from_bulk_insert',
+                False):
+            self.assertEqual(len(inserts), 3)
+        else:
+            self.assertEqual(len(inserts), 5)
+
+    def test_bulk_create_compact(self):
+        r = self.client.post('bulk_author_list', data=json.dumps(
+            [{'name': 'A'}, {'name': 'B'}]), content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json, list(Author.objects.filter(
+            name__in=['A', 'B']).order_by('name').values_list('id',
+            flat=True)))
+
+    def test_bulk_create_errors(self):
+        """Test that nothing is created if any of the objects is invalid"""
+
+        r = self.client.post('bulk_publisher_list', data=json.dumps(
+            [{'name': 'Valid'}, {}, 'bogus']),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(sorted(r.json['errors'].keys()), ['1', '2'])
+        self.assertIn('name', r.json['errors']['1'])
+        self.assertFalse(Publisher.objects.filter(name='Valid').exists())
+
+        r = self.client.post('bulk_publisher_list', data=json.dumps(
+            [{'name': 'Publisher'}] * 6), content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+
+        r = self.client.post('publisher_list', data=json.dumps(
+            [{'name': 'Publisher'}]), content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(Publisher.objects.count(), 1)
+
+    def test_bulk_create_duplicates(self):
+        """Test that unique values are checked across the whole batch"""
+
+        book = {'author': self.author.id, 'publisher': self.publisher.id,
+            'title': 'New', 'price': '1.00'}
+        items = [dict(book, isbn='111'), dict(book, isbn='222'),
+            dict(book, isbn='111'), dict(book, isbn=self.book.isbn)]
+        count = Book.objects.count()
+        r = self.client.post('bulk_book_list', data=json.dumps(items),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(sorted(r.json['errors'].keys()), ['3'])
+
+        r = self.client.post('bulk_book_list', data=json.dumps(items[:3]),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json['errors'], {'2': {'isbn': [
+            'Duplicate of item 0']}})
+        self.assertEqual(Book.objects.count(), count)
+
+    def _bulk(self, method, url_name, query, data=None):
+        url = '%s?%s' % (reverse(url_name), urlencode(query))
+        return self.client.process(getattr(Client, method)(self.client, url,
+            data=json.dumps(data), content_type='application/json'))
+
+    def test_bulk_update(self):
+        """Excercise updating many objects with a single query"""
+
+        self._create_books(['1.0', '2.0', '3.0'])
+        books = list(Book.objects.order_by('id'))
+
+        with CaptureQueriesContext(connection) as queries:
+            r = self._bulk('patch', 'bulk_book_list',
+                {'ids': '%d,%d' % (books[0].id, books[1].id)},
+                {'price': '7.50'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'updated': 2})
+        # Books are cached by the test views, so their primary keys (and
+        # then their ISBNs) are read to drop them from the caches
+        self.assertEqual([q['sql'].split()[0] for q in queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))],
+            ['SELECT', 'UPDATE', 'SELECT'])
+        self.assertEqual([b.price for b in Book.objects.order_by('id')],
+            [Decimal('7.50'), Decimal('7.50'), Decimal('2.0'),
+                Decimal('3.0')])
+
+        r = self._bulk('patch', 'bulk_book_list',
+            {'author': books[2].author_id}, {'title': 'Changed'})
+        self.assertEqual(r.json, {'updated': 1})
+        self.assertEqual(Book.objects.get(id=books[2].id).title, 'Changed')
+
+    def test_bulk_update_sends_signals(self):
+        from django.db.models.signals import post_save
+
+        saved = []
+
+        def receiver(sender, instance, **kwargs):
+            saved.append((instance.id, kwargs['update_fields']))
+        post_save.connect(receiver, sender=Book)
+        try:
+            r = self._bulk('patch', 'saving_bulk_book_list',
+                {'ids': self.book.id}, {'title': 'Changed'})
+        finally:
+            post_save.disconnect(receiver, sender=Book)
+        self.assertEqual(r.json, {'updated': 1})
+        self.assertEqual(saved, [(self.book.id, frozenset(['title']))])
+
+    def test_bulk_update_errors(self):
+        for query, data in [({}, {'title': 'X'}),
+                ({'ids': 'x'}, {'title': 'X'}),
+                ({'ids': self.book.id}, {'price': 'x'}),
+                ({'ids': self.book.id}, {'id': 5}),
+                ({'ids': self.book.id}, {'nonexistent': 5}),
+                ({'ids': self.book.id}, [])]:
+            r = self._bulk('patch', 'bulk_book_list', query, data)
+            self.assertEqual(r.status_code, 400)
+        self.assertEqual(Book.objects.get(id=self.book.id).title, 'Book')
+
+        r = self._bulk('patch', 'publisher_list', {'ids': 1}, {'name': 'X'})
+        self.assertEqual(r.status_code, 405)
+
+    def test_bulk_delete(self):
+        """Excercise deleting many objects at once"""
+
+        self._create_books(['1.0', '2.0'])
+        authors = list(Book.objects.exclude(id=self.book.id).values_list(
+            'author_id', flat=True))
+
+        r = self._bulk('delete', 'bulk_book_list',
+            {'author__in': ','.join(map(str, authors))})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'deleted': 2})
+        self.assertEqual(list(Book.objects.all()), [self.book])
+
+        r = self._bulk('delete', 'bulk_book_list', {})
+        self.assertEqual(r.status_code, 400)
+
+    def _patch(self, url_name, data, **kwargs):
+        return self.client.process(Client.patch(self.client,
+            reverse(url_name, kwargs=kwargs), data=json.dumps(data),
+            content_type='application/json'))
+
+    def test_patch(self):
+        """Test that PATCH saves only the changed fields"""
+
+        with CaptureQueriesContext(connection) as queries:
+            r = self._patch('book_detail', {'price': '12.50', 'title': 'Book'},
+                isbn=self.book.isbn)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['price'], '12.50')
+        self.assertEqual(r.json['title'], 'Book')
+
+        update = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"price"', update[0])
+        self.assertNotIn('"title"', update[0])
+        self.assertEqual(Book.objects.get(id=self.book.id).price,
+            Decimal('12.50'))
+
+        for data in [{'price': 'x'}, {'isbn': ''}, {'id': 3}, {'bogus': 1},
+                []]:
+            r = self._patch('book_detail', data, isbn=self.book.isbn)
+            self.assertEqual(r.status_code, 400)
+
+    def test_patch_is_opt_in(self):
+        r = self._patch('publisher_detail', {'name': 'Changed'},
+            pk=self.publisher.id)
+        self.assertEqual(r.status_code, 405)
+        self.assertNotEqual(Publisher.objects.get(id=self.publisher.id).name,
+            'Changed')
+
+    def test_patch_without_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            r = self._patch('lookup_free_book_detail', {'title': 'Changed'},
+                pk=self.book.id)
+        self.assertEqual(r.status_code, 200)
+        # Books are cached by ISBN by the test views, so it's read to drop
+        # the book from the cache
+        self.assertEqual([q['sql'].split()[0] for q in queries],
+            ['UPDATE', 'SELECT'])
+        self.assertEqual(Book.objects.get(id=self.book.id).title, 'Changed')
+
+        # The object itself doesn't conflict with its unique fields
+        r = self._patch('lookup_free_book_detail', {'isbn': '1234'},
+            pk=self.book.id)
+        self.assertEqual(r.status_code, 200)
+
+        r = self._patch('lookup_free_book_detail', {'title': 'Changed'},
+            pk=self.book.id + 1)
+        self.assertEqual(r.status_code, 404)
+
+        # The unique checks can only exclude the object by its primary key
+        class View(DetailEndpoint):
+            model = Book
+            lookup_field = 'isbn'
+            methods = ['PATCH']
+            patch_without_lookup = True
+
+        request = RequestFactory().patch('/', data=json.dumps(
+            {'isbn': self.book.isbn}), content_type='application/json')
+        self.assertRaises(ImproperlyConfigured, View.as_view(), request,
+            isbn=self.book.isbn)
+
+    def test_conditional_get_detail(self):
+        """Test that unchanged objects aren't loaded and serialized"""
+
+        article = Article.objects.create(title='Article')
+        r = self.client.get('article_detail', pk=article.pk)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['title'], 'Article')
+        etag = r['ETag']
+        self.assertFalse(r.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            r = self.client.get('article_detail', pk=article.pk,
+                extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r['ETag'], etag)
+
+        Article.objects.filter(pk=article.pk).update(version=2)
+        r = self.client.get('article_detail', pk=article.pk,
+            extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+        r = self.client.get('article_detail', pk=article.pk + 1)
+        self.assertEqual(r.status_code, 404)
+
+    def test_conditional_get_list(self):
+        article = Article.objects.create(title='Article')
+        r = self.client.get('article_list')
+        self.assertEqual(r.status_code, 200)
+        etag = r['ETag']
+        self.assertFalse(r.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            r = self.client.get('article_list',
+                extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 304)
+
+        # The representation depends on the query parameters too
+        r = self.client.get('article_list', data={'x': 1},
+            extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
+
+        article.delete()
+        r = self.client.get('article_list',
+            extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, [])
+
+    def test_conditional_get_list_delete_older(self):
+        """Test that deleting an older object changes the list version"""
+
+        older = Article.objects.create(title='Older')
+        newer = Article.objects.create(title='Newer')
+        etag = self.client.get('article_list')['ETag']
+        last_modified = http_date(calendar.timegm(
+            newer.modified.utctimetuple()))
+        older.delete()
+
+        # The latest modification time is the same, so If-Modified-Since
+        # alone is ignored for lists
+        r = self.client.get('article_list',
+            extra={'HTTP_IF_MODIFIED_SINCE': last_modified})
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get('article_list',
+            extra={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([a['title'] for a in r.json], ['Newer'])
+
+    def test_bulk_update_touches_auto_now(self):
+        article = Article.objects.create(title='Article')
+        for skip_signals in [True, False]:
+            modified = Article.objects.get().modified
+            etag = self.client.get('article_list')['ETag']
+
+            ArticleList.bulk_skip_signals = skip_signals
+            try:
+                r = self._bulk('patch', 'article_list', {'ids': article.id},
+                    {'title': 'Changed %s' % skip_signals})
+            finally:
+                del ArticleList.bulk_skip_signals
+            self.assertEqual(r.json, {'updated': 1})
+            self.assertGreater(Article.objects.get().modified, modified)
+
+            r = self.client.get('article_list',
+                extra={'HTTP_IF_NONE_MATCH': etag})
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json[0]['title'], 'Changed %s' % skip_signals)
+
+    def test_instance_cache(self):
+        """Test that cached instances are served without querying"""
+
+        cache = CachedBookDetail.instance_cache
+        cache.cache.clear()
+        before = cache.stats()
+
+        r = self.client.get('cached_book_detail', isbn='1234')
+        self.assertEqual(r.json['title'], 'Book')
+        with self.assertNumQueries(0):
+            r = self.client.get('cached_book_detail', isbn='1234')
+        self.assertEqual(r.json['title'], 'Book')
+
+        # Saving the instance invalidates it, even under the old ISBN
+        self.book.title = 'Changed'
+        self.book.save()
+        r = self.client.get('cached_book_detail', isbn='1234')
+        self.assertEqual(r.json['title'], 'Changed')
+        self.book.isbn = '5678'
+        self.book.save()
+        r = self.client.get('cached_book_detail', isbn='1234')
+        self.assertEqual(r.status_code, 404)
+
+        # Writes load the instance from the database, not the cache
+        r = self.client.get('cached_book_detail', isbn='5678')
+        r = self.client.put('cached_book_detail', isbn='5678',
+            content_type='application/json', data=json.dumps({
+                'author': self.author.id, 'publisher': self.publisher.id,
+                'title': 'Put', 'isbn': '5678', 'price': '1.00'}))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Book.objects.get(isbn='5678').title, 'Put')
+
+        self.book.delete()
+        r = self.client.get('cached_book_detail', isbn='5678')
+        self.assertEqual(r.status_code, 404)
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+        self.assertEqual(stats['misses'] - before['misses'], 5)
+
+    def test_instance_cache_patch_without_lookup(self):
+        r = self.client.get('cached_lookup_free_book_detail', pk=self.book.pk)
+        self.assertEqual(r.json['title'], 'Book')
+
+        r = self._patch('cached_lookup_free_book_detail', {'title': 'New'},
+            pk=self.book.pk)
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get('cached_lookup_free_book_detail', pk=self.book.pk)
+        self.assertEqual(r.json['title'], 'New')
+
+    def test_instance_cache_bulk_update(self):
+        r = self.client.get('cached_lookup_free_book_detail', pk=self.book.pk)
+        self.assertEqual(r.json['title'], 'Book')
+
+        r = self._bulk('patch', 'bulk_book_list', {'ids': self.book.id},
+            {'title': 'Changed'})
+        self.assertEqual(r.json, {'updated': 1})
+        r = self.client.get('cached_lookup_free_book_detail', pk=self.book.pk)
+        self.assertEqual(r.json['title'], 'Changed')
+
+    def test_instance_cache_negative(self):
+        cache = CachedBookDetail.instance_cache
+        cache.cache.clear()
+        before = cache.stats()['negative_hits']
+
+        r = self.client.get('cached_book_detail', isbn='999')
+        self.assertEqual(r.status_code, 404)
+        with self.assertNumQueries(0):
+            r = self.client.get('cached_book_detail', isbn='999')
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(cache.stats()['negative_hits'] - before, 1)
+
+        self.author.books.create(title='New', isbn='999',
+            price=Decimal('1.0'), publisher=self.publisher)
+        r = self.client.get('cached_book_detail', isbn='999')
+        self.assertEqual(r.json['title'], 'New')
+
     def test_book_details(self):
         """Excercise using custom lookup_field on a DetailEndpoint"""
 
         r = self.client.get('book_detail', isbn=self.book.isbn)
         self.assertEqual(r.status_code, 200)
         self.assertEqual(r.json['id'], self.book.id)
+
+
+class TestReplicaRouting(TestCase):
+    multi_db = True  # Django < 2.2
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = TestClient()
+        Article.objects.using('default').create(title='Primary')
+        Article.objects.using('replica').create(title='Replica')
+
+    def _titles(self, r):
+        self.assertEqual(r.status_code, 200)
+        return [a['title'] for a in r.json]
+
+    def test_reads_go_to_replica(self):
+        r = self.client.get('replica_article_list')
+        self.assertEqual(self._titles(r), ['Replica'])
+        self.assertFalse(r.has_header(routing.PIN_HEADER))
+
+        r = self.client.get('replica_article_stream')
+        self.assertEqual(json.loads(b''.join(r.streaming_content).decode(
+            'utf-8')), [{'title': 'Replica'}])
+
+        # Other endpoints and code outside of the endpoints are unaffected
+        self.assertEqual(self._titles(self.client.get('article_list')),
+            ['Primary'])
+        self.assertEqual(Article.objects.get().title, 'Primary')
+
+    def test_writes_pin_to_primary(self):
+        r = self.client.post('replica_article_list', data=json.dumps({
+            'title': 'New', 'version': 1}), content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(Article.objects.using('default').filter(
+            title='New').exists())
+        self.assertFalse(Article.objects.using('replica').filter(
+            title='New').exists())
+        pin = r[routing.PIN_HEADER]
+        self.assertEqual(r.cookies[routing.PIN_COOKIE].value, pin)
+
+        # The test client sends the cookie back
+        self.assertEqual(self._titles(self.client.get(
+            'replica_article_list')), ['Primary', 'New'])
+
+        # Clients without cookies can use the header instead
+        client = TestClient()
+        self.assertEqual(self._titles(client.get('replica_article_list')),
+            ['Replica'])
+        r = client.get('replica_article_list', extra={
+            'HTTP_X_RESTLESS_PRIMARY_PIN': pin})
+        self.assertEqual(self._titles(r), ['Primary', 'New'])
+
+        for value in ['bogus', '1', '%d' % (time.time() + 3600)]:
+            r = client.get('replica_article_list', extra={
+                'HTTP_X_RESTLESS_PRIMARY_PIN': value})
+            self.assertEqual(self._titles(r), ['Replica'])
+
+    def test_write_database_only(self):
+        r = self.client.post('other_database_article_list',
+            data=json.dumps({'title': 'New', 'version': 1}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertFalse(r.has_header(routing.PIN_HEADER))
+        self.assertTrue(Article.objects.using('replica').filter(
+            title='New').exists())
+        self.assertFalse(Article.objects.using('default').filter(
+            title='New').exists())
+        self.assertEqual(self._titles(self.client.get(
+            'other_database_article_list')), ['Replica', 'New'])
+
+    def test_auth_models_read_from_primary(self):
+        from django.contrib.sessions.models import Session
+
+        request = RequestFactory().get('/')
+        router = routing.EndpointRouter()
+        with routing.route(ReplicaArticleList(), request):
+            self.assertEqual(router.db_for_read(Article), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_read(Token), 'default')
+            with self.settings(RESTLESS_PRIMARY_APPS=['sessions']):
+                self.assertEqual(router.db_for_read(Token), 'replica')
+                self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_failed_writes_dont_pin(self):
+        r = self.client.post('replica_article_list', data=json.dumps({}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(r.has_header(routing.PIN_HEADER))
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = TestClient()
+        self.publisher = Publisher.objects.create(name='Publisher')
+
+    def _names(self, r):
+        self.assertEqual(r.status_code, 200)
+        return [p['name'] for p in r.json]
+
+    def _build_fails(self):
+        raise AssertionError('response should not be built')
+
+    def test_responses_are_cached(self):
+        r = self.client.get('cached_publisher_list')
+        self.assertEqual(self._names(r), ['Publisher'])
+        with self.assertNumQueries(0):
+            cached = self.client.get('cached_publisher_list')
+        self.assertEqual(cached.content, r.content)
+        self.assertEqual(cached['Content-Type'], r['Content-Type'])
+
+        # Different parameters are cached separately
+        with self.assertNumQueries(1):
+            self.client.get('cached_publisher_list', data={'a': '1'})
+        with self.assertNumQueries(0):
+            self.client.get('cached_publisher_list', data={'a': '1'})
+
+    def test_invalidated_on_save_and_delete(self):
+        self.client.get('cached_publisher_list')
+
+        Publisher.objects.create(name='Another')
+        self.assertEqual(self._names(self.client.get(
+            'cached_publisher_list')), ['Publisher', 'Another'])
+
+        self.publisher.delete()
+        self.assertEqual(self._names(self.client.get(
+            'cached_publisher_list')), ['Another'])
+
+        # update() doesn't send signals, so it isn't noticed
+        Publisher.objects.update(name='Changed')
+        self.assertEqual(self._names(self.client.get(
+            'cached_publisher_list')), ['Another'])
+        CachedPublisherList.response_cache.invalidate_model(Publisher)
+        self.assertEqual(self._names(self.client.get(
+            'cached_publisher_list')), ['Changed'])
+
+    def test_invalidated_on_bulk_changes(self):
+        self.client.get('cached_publisher_list')
+
+        r = self.client.post('bulk_publisher_list', data=json.dumps(
+            [{'name': 'First'}, {'name': 'Second'}]),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(self._names(self.client.get(
+            'cached_publisher_list')), ['Publisher', 'First', 'Second'])
+
+        objects_changed.send(sender=Publisher, pks=[], using='default')
+        with self.assertNumQueries(1):
+            self.client.get('cached_publisher_list')
+
+    def test_responses_are_cached_per_user(self):
+        User.objects.create_user(username='alice', password='secret')
+        User.objects.create_user(username='bob', password='secret')
+
+        def get(username=None):
+            extra = {}
+            if username is not None:
+                extra['HTTP_AUTHORIZATION'] = 'Basic ' + base64.b64encode(
+                    ('%s:secret' % username).encode('ascii')).decode('ascii')
+            return self.client.get('cached_secret_view', extra=extra)
+
+        r = get('alice')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'secret': 'alice'})
+
+        # The view checks still apply to the other clients
+        self.assertEqual(get().status_code, 401)
+        self.assertEqual(get('bob').json, {'secret': 'bob'})
+        self.assertEqual(get('alice').json, {'secret': 'alice'})
+
+    def test_errors_are_not_cached(self):
+        r = self.client.post('cached_publisher_list', data=json.dumps({}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+
+        cache = ResponseCache()
+        request = RequestFactory().get('/')
+        response = cache.get_response(None, request,
+            lambda: Http404('missing'))
+        self.assertEqual(response.status_code, 404)
+        response = cache.get_response(None, request,
+            lambda: Http200({'found': True}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_vary_on_user(self):
+        cache = ResponseCache(vary_on_user=True,
+            vary_on=lambda request: request.params.get('scope'))
+        factory = RequestFactory()
+        user = User.objects.create_user(username='foo', password='bar')
+
+        def key(path='/', user=user, **params):
+            request = factory.get(path, params)
+            request.params = params
+            request.user = user
+            return cache.key(None, request)
+
+        keys = set([key(), key(user=AnonymousUser()), key(scope='read'),
+            key('/other/')])
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(key(), key())
+
+    def test_concurrent_rebuild(self):
+        """Test that only the lock holder builds the response"""
+
+        cache = ResponseCache(timeout=0, lock_timeout=5)
+        request = RequestFactory().get('/')
+        key = cache.key(None, request)
+
+        # Without a cached response, others wait for the lock holder
+        response, locked = cache.lookup(key)
+        self.assertIsNone(response)
+        self.assertTrue(locked)
+        self.assertEqual(cache.lookup(key), (None, False))
+
+        def build():
+            time.sleep(0.1)
+            cache.store(key, Http200({'built': 1}), locked=True)
+        thread = threading.Thread(target=build)
+        thread.start()
+        response = cache.get_response(None, request, self._build_fails)
+        thread.join()
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+            {'built': 1})
+
+        # Expired responses are served while being rebuilt elsewhere
+        response, locked = cache.lookup(key)
+        self.assertIsNone(response)
+        self.assertTrue(locked)
+        response = cache.get_response(None, request, self._build_fails)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+            {'built': 1})
+
+        cache.release(key)
+        response = cache.get_response(None, request,
+            lambda: Http200({'built': 2}))
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+            {'built': 2})
+
+    def test_waiters_take_over_uncached_build(self):
+        """Test that waiters don't wait for responses that aren't cached"""
+
+        cache = ResponseCache(lock_timeout=5)
+        request = RequestFactory().get('/')
+        key = cache.key(None, request)
+        self.assertEqual(cache.lookup(key), (None, True))
+
+        def build():
+            time.sleep(0.1)
+            cache.store(key, Http404('missing'), locked=True)
+        thread = threading.Thread(target=build)
+        thread.start()
+        start = time.time()
+        response = cache.get_response(None, request,
+            lambda: Http200({'built': 1}))
+        thread.join()
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+            {'built': 1})
+        self.assertEqual(cache.lookup(key)[0].status_code, 200)
+
+
+class TestRequestCoalescing(TestCase):
+
+    def setUp(self):
+        CoalescedView.calls = 0
+
+    def _get_concurrently(self, requests):
+        view = CoalescedView.as_view()
+        responses = [None] * len(requests)
+
+        def get(i):
+            responses[i] = view(requests[i])
+        threads = [threading.Thread(target=get, args=(i,))
+            for i in range(len(requests))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_identical_requests_share_response(self):
+        factory = RequestFactory()
+        responses = self._get_concurrently([factory.get('/',
+            {'delay': '0.2'}) for i in range(5)])
+        self.assertEqual(CoalescedView.calls, 1)
+        self.assertEqual([json.loads(r.content.decode('utf-8'))
+            for r in responses], [{'calls': 1}] * 5)
+
+        # Later requests are handled again
+        self._get_concurrently([factory.get('/')])
+        self.assertEqual(CoalescedView.calls, 2)
+
+    def test_different_requests_are_separate(self):
+        factory = RequestFactory()
+        requests = [factory.get('/', {'delay': '0.2'}),
+            factory.get('/', {'delay': '0.2', 'a': '1'}),
+            factory.get('/', {'delay': '0.2'},
+                HTTP_AUTHORIZATION='Basic Zm9vOmJhcg=='),
+            factory.get('/', {'delay': '0.2'}, HTTP_IF_NONE_MATCH='"1"'),
+            factory.get('/', {'delay': '0.2'},
+                HTTP_IF_MODIFIED_SINCE=http_date(0)),
+            factory.post('/', {'delay': '0.2'})]
+        responses = self._get_concurrently(requests)
+        self.assertEqual(CoalescedView.calls, 5)
+        self.assertEqual(responses[-1].status_code, 405)
+
+    def test_only_successful_responses_are_shared(self):
+        factory = RequestFactory()
+        responses = self._get_concurrently([factory.get('/',
+            {'delay': '0.2', 'missing': '1'}) for i in range(3)])
+        self.assertEqual(CoalescedView.calls, 3)
+        self.assertEqual([r.status_code for r in responses], [404] * 3)
+
+
+@unittest.skipIf(DJANGO_VERSION[:2] < (4, 1),
+    'async views require Django 4.1+')
+class TestAsyncViews(TestCase):
+
+    def setUp(self):
+        self.client = TestClient()
+        self.user = User.objects.create_user(username='foo', password='bar')
+        self.publisher = Publisher.objects.create(name='User Foo')
+
+    def test_request_attributes(self):
+        """Test that async views get the same request attributes"""
+
+        r = self.client.post('async_echo_view', data=json.dumps({'a': 1}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data'], {'a': 1})
+
+    def test_raised_error_is_returned(self):
+        """Test that HttpError raised in an async view is returned"""
+
+        r = self.client.get('async_error_raising_view')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json['error'], 'raised error')
+        self.assertEqual(r.json['extra_data'], 'foo')
+
+    def test_basic_auth(self):
+        """Test sync auth mixins and login_required on async views"""
+
+        r = self.client.get('async_basic_auth_view')
+        self.assertEqual(r.status_code, 401)
+
+        r = self.client.get('async_basic_auth_view', extra={
+            'HTTP_AUTHORIZATION': 'Basic ' +
+                base64.b64encode(b'foo:bar').decode('ascii'),
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'user': 'foo'})
+
+    def test_async_authenticate(self):
+        """Test that authenticate can be a coroutine"""
+
+        r = self.client.get('async_custom_auth_method')
+        self.assertEqual(r.status_code, 403)
+        r = self.client.get('async_custom_auth_method',
+            data={'user': 'friend'})
+        self.assertEqual(r.status_code, 200)
+
+    def test_publisher_list_and_create(self):
+        """Excercise AsyncListEndpoint"""
+
+        r = self.client.get('async_publisher_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, [{'id': self.publisher.id,
+            'name': 'User Foo'}])
+
+        r = self.client.post('async_publisher_list', data=json.dumps({
+            'name': 'Another Publisher'
+            }), content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(Publisher.objects.filter(pk=r.json['id']).exists())
+
+        r = self.client.post('async_publisher_list', data=json.dumps({}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+
+    def test_publisher_detail(self):
+        """Excercise AsyncDetailEndpoint"""
+
+        r = self.client.get('async_publisher_detail', pk=self.publisher.id)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['id'], self.publisher.id)
+
+        r = self.client.get('async_publisher_detail', pk=self.publisher.id + 1)
+        self.assertEqual(r.status_code, 404)
+
+        r = self.client.put('async_publisher_detail', pk=self.publisher.id,
+            content_type='application/json', data=json.dumps({
+                'name': 'Changed Name'
+            }))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Publisher.objects.get().name, 'Changed Name')
+
+        r = self.client.delete('async_publisher_detail', pk=self.publisher.id)
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(Publisher.objects.exists())
+
+    def test_publisher_action(self):
+        """Excercise AsyncActionEndpoint"""
+
+        r = self.client.post('async_publisher_action', pk=self.publisher.id,
+            content_type='application/json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json, {'result': 'done', 'name': 'User Foo'})
+
+        r = self.client.get('async_publisher_action', pk=self.publisher.id)
+        self.assertEqual(r.status_code, 405)
+
+    def test_response_cache(self):
+        caches['default'].clear()
+        r = self.client.get('async_cached_publisher_list')
+        self.assertEqual(r.status_code, 200)
+        with self.assertNumQueries(0):
+            cached = self.client.get('async_cached_publisher_list')
+        self.assertEqual(cached.content, r.content)
+
+        Publisher.objects.create(name='Another')
+        r = self.client.get('async_cached_publisher_list')
+        self.assertEqual(len(r.json), 2)
+
+    def test_request_coalescing(self):
+        import asyncio
+        from .asyncviews import AsyncCoalescedView
+
+        AsyncCoalescedView.calls = 0
+        view = AsyncCoalescedView.as_view()
+        factory = RequestFactory()
+
+        async def get_all():
+            return await asyncio.gather(*[
+                view(factory.get('/', {'delay': '0.1'})) for i in range(5)])
+
+        responses = asyncio.run(get_all())
+        self.assertEqual(AsyncCoalescedView.calls, 1)
+        self.assertEqual([json.loads(r.content.decode('utf-8'))
+            for r in responses], [{'calls': 1}] * 5)
+
+        async def get_missing():
+            return await asyncio.gather(*[view(factory.get('/',
+                {'delay': '0.1', 'missing': '1'})) for i in range(3)])
+
+        responses = asyncio.run(get_missing())
+        self.assertEqual(AsyncCoalescedView.calls, 4)
+        self.assertEqual([r.status_code for r in responses], [404] * 3)
+
+    def test_timing(self):
+        """Test that phases run in worker threads are timed too"""
+
+        with self.settings(RESTLESS_TIMING=True, RESTLESS_TIMING_HEADER=True):
+            r = self.client.get('async_publisher_list')
+        phases = [item.split(';')[0]
+            for item in r['Server-Timing'].split(', ')]
+        self.assertEqual(phases,
+            ['auth', 'handler', 'serialize', 'encode', 'total'])
@@ -1,4 +1,7 @@
-from django.conf.urls import url
+try:
+    from django.conf.urls import url
+except ImportError:
+    from django.urls import re_path as url
 
 try:
     from django.conf.urls import patterns
@@ -8,6 +11,31 @@ except ImportError:
 
 from .views import *
 
+try:
+    from .asyncviews import *
+    async_urlpatterns = [
+        url(r'^async/echo/$', AsyncEchoView.as_view(),
+            name='async_echo_view'),
+        url(r'^async/error-raising-view/$', AsyncErrorRaisingView.as_view(),
+            name='async_error_raising_view'),
+        url(r'^async/basic-auth-view/$', AsyncBasicAuth.as_view(),
+            name='async_basic_auth_view'),
+        url(r'^async/custom-auth/$', AsyncCustomAuthMethod.as_view(),
+            name='async_custom_auth_method'),
+        url(r'^async/publishers/$', AsyncPublisherList.as_view(),
+            name='async_publisher_list'),
+        url(r'^async/publishers/cached/$',
+            AsyncCachedPublisherList.as_view(),
+            name='async_cached_publisher_list'),
+        url(r'^async/publishers/(?P<pk>\d+)$',
+            AsyncPublisherDetail.as_view(), name='async_publisher_detail'),
+        url(r'^async/publishers/(?P<pk>\d+)/do_something$',
+            AsyncPublisherAction.as_view(), name='async_publisher_action'),
+    ]
+except (ImportError, SyntaxError):
+    # Async views require Python 3.5+ and Django 4.1+
+    async_urlpatterns = []
+
 urlpatterns = patterns('',
     url(r'^authors/$', AuthorList.as_view(),
         name='author_list'),
@@ -20,6 +48,14 @@ urlpatterns = patterns('',
         name='login_view'),
     url(r'^basic-auth-view/$', TestBasicAuth.as_view(),
         name='basic_auth_view'),
+    url(r'^cached-basic-auth-view/$', TestCachedBasicAuth.as_view(),
+        name='cached_basic_auth_view'),
+    url(r'^token-auth-view/$', TestTokenAuth.as_view(),
+        name='token_auth_view'),
+    url(r'^signed-token-login/$', TestSignedTokenLogin.as_view(),
+        name='signed_token_login'),
+    url(r'^signed-token-auth-view/$', TestSignedTokenAuth.as_view(),
+        name='signed_token_auth_view'),
     url(r'^custom-auth/$', TestCustomAuthMethod.as_view(),
         name='custom_auth_method'),
     url(r'^echo-view/$', EchoView.as_view(),
@@ -38,6 +74,51 @@ urlpatterns = patterns('',
 
     url(r'^books/(?P<isbn>\d+)$', BookDetail.as_view(),
         name='book_detail'),
+    url(r'^books-lookup-free/(?P<pk>\d+)$', LookupFreeBookDetail.as_view(),
+        name='lookup_free_book_detail'),
+    url(r'^books-cached/(?P<isbn>\d+)$', CachedBookDetail.as_view(),
+        name='cached_book_detail'),
+    url(r'^books-cached-lookup-free/(?P<pk>\d+)$',
+        CachedLookupFreeBookDetail.as_view(),
+        name='cached_lookup_free_book_detail'),
+    url(r'^authors-with-books/$', AuthorBooksList.as_view(),
+        name='author_books_list'),
+    url(r'^books/$', CursorBookList.as_view(),
+        name='cursor_book_list'),
+    url(r'^books-filtered/$', FilteredBookList.as_view(),
+        name='filtered_book_list'),
+    url(r'^books-sparse/$', SparseBookList.as_view(),
+        name='sparse_book_list'),
+    url(r'^books-sparse/(?P<pk>\d+)$', SparseBookDetail.as_view(),
+        name='sparse_book_detail'),
+    url(r'^publishers-bulk/$', BulkPublisherList.as_view(),
+        name='bulk_publisher_list'),
+    url(r'^authors-bulk/$', BulkAuthorList.as_view(),
+        name='bulk_author_list'),
+    url(r'^books-bulk/$', BulkBookList.as_view(),
+        name='bulk_book_list'),
+    url(r'^books-bulk-saving/$', SavingBulkBookList.as_view(),
+        name='saving_bulk_book_list'),
+    url(r'^articles/$', ArticleList.as_view(),
+        name='article_list'),
+    url(r'^articles/(?P<pk>\d+)$', ArticleDetail.as_view(),
+        name='article_detail'),
+    url(r'^articles-replica/$', ReplicaArticleList.as_view(),
+        name='replica_article_list'),
+    url(r'^articles-replica/stream/$', ReplicaArticleStream.as_view(),
+        name='replica_article_stream'),
+    url(r'^publishers/cached/$', CachedPublisherList.as_view(),
+        name='cached_publisher_list'),
+    url(r'^cached-secret/$', CachedSecretView.as_view(),
+        name='cached_secret_view'),
+    url(r'^articles/other-database/$', OtherDatabaseArticleList.as_view(),
+        name='other_database_article_list'),
+    url(r'^authors-paged/$', OffsetAuthorList.as_view(),
+        name='offset_author_list'),
+    url(r'^authors-stream/$', AuthorStream.as_view(),
+        name='author_stream'),
+)
 
+urlpatterns = list(urlpatterns) + async_urlpatterns + [
     url(r'^.*$', WildcardHandler.as_view()),
-)
+]
@@ -1,12 +1,15 @@
 import base64
+import time
 
 from restless.views import Endpoint
-from restless.models import serialize
+from restless.models import serialize, iter_serialize
 from restless.http import Http201, Http403, Http404, Http400, HttpError
 from restless.auth import (AuthenticateEndpoint, BasicHttpAuthMixin,
+    TokenAuthMixin, SignedTokenAuthMixin,
     login_required)
 
 from restless.modelviews import ListEndpoint, DetailEndpoint, ActionEndpoint
+from restless.cache import InstanceCache, ResponseCache
 
 from .models import *
 from .forms import *
@@ -14,7 +17,16 @@ from .forms import *
 __all__ = ['AuthorList', 'AuthorDetail', 'FailsIntentionally', 'TestLogin',
     'TestBasicAuth', 'WildcardHandler', 'EchoView', 'ErrorRaisingView',
     'PublisherAutoList', 'PublisherAutoDetail', 'ReadOnlyPublisherAutoList',
-    'PublisherAction', 'BookDetail', 'TestCustomAuthMethod']
+    'PublisherAction', 'BookDetail', 'TestCustomAuthMethod',
+    'AuthorBooksList', 'AuthorStream', 'UploadView', 'TestCachedBasicAuth',
+    'TestTokenAuth', 'TestSignedTokenLogin', 'TestSignedTokenAuth',
+    'CursorBookList', 'FilteredBookList', 'SparseBookList',
+    'SparseBookDetail', 'BulkPublisherList', 'BulkAuthorList',
+    'BulkBookList', 'SavingBulkBookList', 'LookupFreeBookDetail',
+    'ArticleList', 'ArticleDetail', 'CachedBookDetail', 'ReplicaArticleList',
+    'ReplicaArticleStream', 'OffsetAuthorList',
+    'CachedPublisherList', 'CachedSecretView', 'OtherDatabaseArticleList',
+    'CachedLookupFreeBookDetail']
 
 
 class AuthorList(Endpoint):
@@ -75,6 +87,40 @@ class TestBasicAuth(Endpoint, BasicHttpAuthMixin):
         return serialize(request.user)
 
 
+class TestCachedBasicAuth(TestBasicAuth):
+    credentials_cache_timeout = 60
+
+
+class CachedSecretView(Endpoint, BasicHttpAuthMixin):
+    response_cache = ResponseCache(timeout=60)
+
+    @login_required
+    def get(self, request):
+        return {'secret': request.user.username}
+
+
+class TestTokenAuth(Endpoint, TokenAuthMixin):
+    token_cache_timeout = 300
+
+    @login_required
+    def get(self, request):
+        return serialize(request.user, fields=['id', 'username'])
+
+
+class TestSignedTokenLogin(AuthenticateEndpoint):
+    issue_signed_token = True
+    login_session = False
+
+
+class TestSignedTokenAuth(Endpoint, SignedTokenAuthMixin):
+    @login_required
+    def get(self, request):
+        data = {'id': request.user.id, 'username': request.user.username}
+        if 'full' in request.params:
+            data['email'] = request.user.email
+        return data
+
+
 class TestCustomAuthMethod(Endpoint):
     def authenticate(self, request):
         user = request.params.get('user')
@@ -140,3 +186,175 @@ class PublisherAction(ActionEndpoint):
 class BookDetail(DetailEndpoint):
     model = Book
     lookup_field = 'isbn'
+    methods = ['GET', 'PUT', 'PATCH', 'DELETE']
+
+
+class LookupFreeBookDetail(DetailEndpoint):
+    model = Book
+    methods = ['PATCH']
+    patch_without_lookup = True
+
+
+class CachedBookDetail(DetailEndpoint):
+    model = Book
+    lookup_field = 'isbn'
+    instance_cache = InstanceCache(Book, lookup_field='isbn',
+        negative_timeout=60)
+
+
+class CachedLookupFreeBookDetail(DetailEndpoint):
+    model = Book
+    methods = ['GET', 'PATCH']
+    patch_without_lookup = True
+    instance_cache = InstanceCache(Book)
+
+
+class AuthorBooksList(ListEndpoint):
+    model = Author
+
+    def serialize(self, objs):
+        return serialize(objs, include=[
+            ('books', dict(
+                fields=['title'],
+                include=[('publisher', dict())]
+            ))
+        ])
+
+
+class CursorBookList(ListEndpoint):
+    model = Book
+    pagination = 'cursor'
+    ordering = ('-price',)
+    page_size = 2
+    max_page_size = 3
+
+    def serialize(self, objs):
+        return serialize(objs, fields=['id', 'title', 'price'],
+            include=[('author', dict(fields=['name']))])
+
+
+class FilteredBookList(ListEndpoint):
+    model = Book
+    filter_fields = {
+        'author': ['exact', 'in'],
+        'id': ['range', 'gte', 'lte'],
+        'publisher': ['isnull'],
+    }
+    ordering_fields = ['id', 'isbn']
+
+    def serialize(self, objs):
+        return serialize(objs, fields=['id'])
+
+
+class SparseBookList(ListEndpoint):
+    model = Book
+    pagination = 'cursor'
+    ordering = ('-price',)
+    sparse_fields = ['id', 'title', 'isbn', 'price']
+    sparse_include = {'author': dict(fields=['name'])}
+
+
+class SparseBookDetail(DetailEndpoint):
+    model = Book
+    sparse_fields = ['id', 'title']
+    sparse_include = {'publisher': dict(fields=['name'])}
+
+
+class BulkPublisherList(ListEndpoint):
+    model = Publisher
+    bulk = True
+    bulk_batch_size = 2
+    max_bulk_size = 5
+
+
+class BulkAuthorList(ListEndpoint):
+    model = Author
+    bulk = True
+    bulk_compact = True
+
+
+class BulkBookList(ListEndpoint):
+    model = Book
+    methods = ['GET', 'POST', 'PATCH', 'DELETE']
+    bulk = True
+    filter_fields = {'author': ['exact', 'in']}
+    bulk_skip_signals = True
+
+
+class SavingBulkBookList(BulkBookList):
+    bulk_skip_signals = False
+
+
+class ArticleList(ListEndpoint):
+    model = Article
+    methods = ['GET', 'PATCH']
+    version_field = 'modified'
+
+
+class ArticleDetail(DetailEndpoint):
+    model = Article
+    version_field = 'version'
+
+
+class ReplicaArticleList(ListEndpoint):
+    model = Article
+    read_databases = ['replica']
+
+
+class OtherDatabaseArticleList(ListEndpoint):
+    model = Article
+    write_database = 'replica'
+
+
+class ReplicaArticleStream(Endpoint):
+    read_databases = 'replica'
+
+    def get(self, request):
+        return iter_serialize(Article.objects.all(), fields=['title'])
+
+
+class CachedPublisherList(ListEndpoint):
+    model = Publisher
+    response_cache = ResponseCache(timeout=60, depends_on=[Publisher])
+
+
+class OffsetAuthorList(ListEndpoint):
+    model = Author
+    pagination = 'offset'
+    pagination_count = 'approximate'
+    pagination_headers = True
+    page_size = 2
+
+
+class AuthorStream(Endpoint):
+    def get(self, request):
+        return iter_serialize(Author.objects.all(), include=[
+            ('books', dict(fields=['title']))
+        ], chunk_size=2)
+
+
+class UploadView(Endpoint):
+    def post(self, request):
+        return {
+            'data': request.data,
+            'files': sorted(request.FILES.keys()),
+            'raw_data': request.raw_data,
+        }
+
+
+class SleepView(Endpoint):
+    def get(self, request):
+        time.sleep(float(request.params.get('delay', 0)))
+        return {'slept': True}
+
+
+class CoalescedView(Endpoint):
+    coalesce_requests = True
+    calls = 0
+
+    def get(self, request):
+        type(self).calls += 1
+        time.sleep(float(request.params.get('delay', 0)))
+        if 'missing' in request.params:
+            return Http404({'calls': type(self).calls})
+        return {'calls': type(self).calls}
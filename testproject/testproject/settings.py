@@ -1,4 +1,5 @@
 
+import django
 import os.path
 import sys
 
@@ -15,9 +16,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # Stands in for a read replica of the default database
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
 
+DATABASE_ROUTERS = ['restless.routing.EndpointRouter']
+
 # TIME_ZONE = 'America/Chicago'
 # LANGUAGE_CODE = 'en-us'
 # SITE_ID = 1
@@ -40,13 +48,19 @@ TEMPLATE_LOADERS = (
     'django.template.loaders.app_directories.Loader',
 )
 
-MIDDLEWARE_CLASSES = (
+MIDDLEWARE = (
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
 )
 
+if django.VERSION[:2] < (1, 10):
+    MIDDLEWARE_CLASSES = MIDDLEWARE
+
+# Django 3.2+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 ROOT_URLCONF = 'testproject.urls'
 WSGI_APPLICATION = 'testproject.wsgi.application'
 
@@ -60,6 +74,7 @@ INSTALLED_APPS = (
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'restless',
+    'restless.authtoken',
     'testapp',
 )
 
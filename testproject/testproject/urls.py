@@ -1,4 +1,9 @@
-from django.conf.urls import include, url
+from django.conf.urls import include
+
+try:
+    from django.conf.urls import url
+except ImportError:
+    from django.urls import re_path as url
 import testapp.urls
 
 try: